@@ -227,6 +227,7 @@ from visualizer import (  # noqa: E402
     generate_html,
     get_chat_timestamp,
     generate_output_filename,
+    shutdown_render_pool,
     ICON_BASE64,
     ICON_FAVICON_BASE64,
     KNOWN_MESSAGE_TYPES,
@@ -4001,6 +4002,9 @@ def main():
             if agent_fn:
                 AGENT_HTML_MAP[agent_id] = agent_fn
 
+    # Large chats of this scan shared one render pool; stop its workers.
+    shutdown_render_pool()
+
     # Scan summary
     total_scanned = len(stats["new"]) + len(stats["updated"]) + stats["skipped"]
     print(f"  Done: {total_scanned} files scanned.")
@@ -19,15 +19,46 @@ LinkedIn: https://linkedin.com/in/oscar-gonz
 For usage instructions, see README.md or visit the repository.
 """
 
+import contextlib
+import gzip
 import json
 import os
+import pickle
 import re
+import shutil
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List
 from html import escape
 
+# orjson is an optional accelerator for reading big chats; without it the
+# standard library parser is used.
+try:
+    import orjson
+    _orjson_loads = orjson.loads
+except ImportError:
+    _orjson_loads = None
+
+
+def _json_loads(line: bytes):
+    """Parse one JSONL line: orjson when installed, else json.loads.
+
+    orjson is stricter than json.loads: it rejects a lone surrogate escape
+    (tool output cut mid-emoji) and NaN. Such a line is retried with
+    json.loads, so the same lines load with or without orjson.
+    """
+    if _orjson_loads is not None:
+        try:
+            return _orjson_loads(line)
+        except ValueError:
+            pass
+    return json.loads(line)
+
 sys.stdout.reconfigure(encoding="utf-8")
 
 # Icon embedded as base64 for favicon and header (self-contained, no external files)
@@ -79,25 +110,43 @@ ICON_FAVICON_BASE64 = (
     "TkSuQmCC"
 )
 
+# Both icons as bytes, for the streamed chat page (written between fragments
+# of the page head instead of being copied into it).
+_ICON_BASE64_BYTES = ICON_BASE64.encode('ascii')
+_ICON_FAVICON_BASE64_BYTES = ICON_FAVICON_BASE64.encode('ascii')
+
 def parse_chat_json(json_file: str) -> List[Dict]:
-    """Read and parse a JSONL file line by line."""
+    """Read and parse a JSONL file line by line.
+
+    The file is read in one go and split on raw bytes; each line is decoded
+    by the JSON parser itself (orjson when installed), so there is no
+    separate text-decoding pass over the whole file.
+    """
     messages = []
-    with open(json_file, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if line:
-                try:
-                    data = json.loads(line)
-                    data['_line_number'] = line_num
-                    messages.append(data)
-                except json.JSONDecodeError as e:
-                    print(f"Warning: Error parsing line {line_num}: {e}")
-                    continue
+    raw = Path(json_file).read_bytes()
+    if raw.startswith(b'\xef\xbb\xbf'):  # UTF-8 BOM (some Windows editors)
+        raw = raw[3:]
+    for line_num, line in enumerate(raw.split(b'\n'), 1):
+        line = line.strip()
+        if line:
+            try:
+                data = _json_loads(line)
+            except ValueError as e:  # JSONDecodeError (both parsers) or bad UTF-8
+                print(f"Warning: Error parsing line {line_num}: {e}")
+                continue
+            if type(data) is dict:
+                messages.append(data)
+            else:
+                print(f"Warning: Error parsing line {line_num}: not a JSON object")
     return messages
 
 # Application version — single source of truth (used in headers and meta tags).
 APP_VERSION = "2.6.0"
 
+# Size (UTF-8 bytes of rendered messages) from which `generate_html(gzip_copy=True)`
+# also writes a gzipped `.html.gz` sibling. Smaller chats gain little from it.
+GZIP_MIN_BYTES = 5_000_000
+
 # Time display format for timestamps: "12h" (AM/PM) or "24h".
 # Set by generate_html() from config; "12h" is the default.
 TIME_FORMAT = "12h"
@@ -129,23 +178,59 @@ KNOWN_CONTENT_TYPES = frozenset({
 })
 
 
+# Shared read-only stand-in for a missing `message` dict, so `.get()` chains
+# don't allocate a fresh {} per entry. Never mutate it.
+_EMPTY: Dict = {}
+
+
 def _time_pattern() -> str:
     """strftime pattern for the time portion, per TIME_FORMAT."""
     return '%H:%M' if TIME_FORMAT == "24h" else '%I:%M %p'
 
 
+@lru_cache(maxsize=4096)
+def _parse_local_datetime(timestamp_str: str) -> datetime:
+    """Parse an ISO timestamp ('Z' suffix allowed) into local time.
+
+    The local zone is resolved per timestamp by astimezone() on purpose: a zone
+    captured once at import would carry a single UTC offset and shift every
+    timestamp on the other side of a DST change by an hour.
+    """
+    if timestamp_str.endswith('Z'):
+        timestamp_str = timestamp_str[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp_str).astimezone()
+
+
+@lru_cache(maxsize=4096)
+def _format_timestamp_cached(timestamp_str: str, time_pattern: str) -> str:
+    """Parse + format one timestamp. Keyed on the pattern too, so a TIME_FORMAT
+    change never serves a stale entry. Siblings often share a timestamp."""
+    return _parse_local_datetime(timestamp_str).strftime(f'%Y-%m-%d {time_pattern}')
+
+
 def format_timestamp(timestamp_str: str) -> str:
     """Format ISO timestamp to `YYYY-MM-DD <time>` in local timezone.
 
     The time portion follows TIME_FORMAT: 12h (AM/PM, default) or 24h.
     """
     try:
-        dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).astimezone()
-        return dt.strftime(f'%Y-%m-%d {_time_pattern()}')
+        return _format_timestamp_cached(timestamp_str, _time_pattern())
     except (ValueError, TypeError, AttributeError):
         return ""
 
 
+# Patterns used on every rendered text block, compiled once at import.
+_RE_BR_LEADING = re.compile(r'^(?:<br>)+')
+_RE_BR_TRAILING = re.compile(r'(?:<br>)+$')
+_RE_NL_EXCESS = re.compile(r'\n{3,}')
+_RE_SYSTEM_REMINDER = re.compile(
+    r'&lt;system-reminder&gt;(.*?)&lt;/system-reminder&gt;', re.DOTALL)
+_RE_REQUEST_INTERRUPTED = re.compile(r'(\[Request interrupted by user\])')
+_RE_BASH_INPUT = re.compile(r'&lt;bash-input&gt;(.*?)&lt;/bash-input&gt;', re.DOTALL)
+_RE_BASH_STDOUT = re.compile(r'&lt;bash-stdout&gt;(.*?)&lt;/bash-stdout&gt;', re.DOTALL)
+_RE_BASH_STDERR = re.compile(r'&lt;bash-stderr&gt;(.*?)&lt;/bash-stderr&gt;', re.DOTALL)
+
+
 def _format_system_markers(html: str) -> str:
     """Style system markers embedded in already-escaped message text.
 
@@ -157,25 +242,27 @@ def _format_system_markers(html: str) -> str:
     """
     def _reminder(m):
         inner = m.group(1)
-        inner = re.sub(r'^(<br>)+', '', inner)
-        inner = re.sub(r'(<br>)+$', '', inner)
+        inner = _RE_BR_LEADING.sub('', inner)
+        inner = _RE_BR_TRAILING.sub('', inner)
         return f'<span class="system-reminder">{inner}</span>'
 
-    html = re.sub(
-        r'&lt;system-reminder&gt;(.*?)&lt;/system-reminder&gt;',
-        _reminder, html, flags=re.DOTALL)
-    html = re.sub(
-        r'(\[Request interrupted by user\])',
-        r'<span class="request-interrupted">\1</span>', html)
+    # Most text carries none of these markers: a plain substring test (C speed)
+    # gates each regex pass so the common case never enters the regex engine.
+    if '&lt;system-reminder&gt;' in html:
+        html = _RE_SYSTEM_REMINDER.sub(_reminder, html)
+    if '[Request interrupted by user]' in html:
+        html = _RE_REQUEST_INTERRUPTED.sub(r'<span class="request-interrupted">\1</span>', html)
+    if '&lt;bash-' not in html:
+        return html
     # Bash commands sent with "!" in Claude Code arrive as <bash-input>cmd</bash-input>
     # plus <bash-stdout>/<bash-stderr>. Show the command as "! cmd" in red (as the CLI
     # colours it) and the output cleanly (stderr only when non-empty), tags stripped.
-    html = re.sub(r'&lt;bash-input&gt;(.*?)&lt;/bash-input&gt;',
-                  lambda m: f'<span class="bash-bang">! {m.group(1).strip()}</span>', html, flags=re.DOTALL)
-    html = re.sub(r'&lt;bash-stdout&gt;(.*?)&lt;/bash-stdout&gt;',
-                  lambda m: f'<span class="bash-out">{m.group(1)}</span>' if m.group(1).strip() else '', html, flags=re.DOTALL)
-    html = re.sub(r'&lt;bash-stderr&gt;(.*?)&lt;/bash-stderr&gt;',
-                  lambda m: f'<span class="bash-err">{m.group(1)}</span>' if m.group(1).strip() else '', html, flags=re.DOTALL)
+    html = _RE_BASH_INPUT.sub(
+        lambda m: f'<span class="bash-bang">! {m.group(1).strip()}</span>', html)
+    html = _RE_BASH_STDOUT.sub(
+        lambda m: f'<span class="bash-out">{m.group(1)}</span>' if m.group(1).strip() else '', html)
+    html = _RE_BASH_STDERR.sub(
+        lambda m: f'<span class="bash-err">{m.group(1)}</span>' if m.group(1).strip() else '', html)
     return html
 
 
@@ -184,24 +271,48 @@ def escape_html_preserve_structure(text: str) -> str:
     if not text:
         return ""
 
-    text = text.replace('\r', '')  # Normalize Windows line endings
-    text = escape(text)
-    text = text.replace('\n', '<br>')
-    # Compact excessive empty lines: 3+ breaks → 2 (preserve paragraph breaks)
-    text = re.sub(r'(<br>){3,}', '<br><br>', text)
-    text = re.sub(r'  +', lambda m: '&nbsp;' * len(m.group()), text)
-    # Strip leading/trailing breaks to avoid blank space at top/bottom
-    text = re.sub(r'^(<br>)+', '', text)
-    text = re.sub(r'(<br>)+$', '', text)
+    # Line breaks are normalised on the raw text, before escaping grows it:
+    # strip them at both ends (no blank space at top/bottom) and compact 3+
+    # into 2 (preserve paragraph breaks). Each pass is skipped when it has
+    # nothing to do, so the common case is escape() plus one replace().
+    if '\r' in text:
+        text = text.replace('\r', '')  # Normalize Windows line endings
+    text = text.strip('\n')
+    if '\n\n\n' in text:
+        text = _RE_NL_EXCESS.sub('\n\n', text)
+    text = escape(text).replace('\n', '<br>')
+    if '  ' in text:
+        # Every space in a run of 2+ becomes &nbsp;. Pairs first, then the odd
+        # space left at the end of a run ('&nbsp; ' cannot occur in escaped input).
+        text = text.replace('  ', '&nbsp;&nbsp;').replace('&nbsp; ', '&nbsp;&nbsp;')
 
     return _format_system_markers(text)
 
 def is_tool_result_message(content) -> bool:
     """Determine if a message is a tool_result (not a real user message)."""
-    if isinstance(content, list):
-        return any(isinstance(item, dict) and item.get('type') == 'tool_result' for item in content)
+    if type(content) is list:
+        for item in content:
+            if type(item) is dict and item.get('type') == 'tool_result':
+                return True
     return False
 
+
+# Tool-result flag of each user entry of the chat being rendered, filled by
+# generate_html's statistics pass. Keyed by id() and holding the entry itself,
+# so a dict that later reuses the id never matches; the entries themselves are
+# left exactly as parsed.
+_TOOL_RESULT_FLAGS: Dict[int, tuple] = {}
+
+
+def _entry_is_tool_result(msg: Dict) -> bool:
+    """is_tool_result_message for a top-level JSONL entry. Counting, compact
+    grouping and rendering all ask; inside generate_html the answer is looked
+    up instead of rescanning the content."""
+    hit = _TOOL_RESULT_FLAGS.get(id(msg))
+    if hit is not None and hit[0] is msg:
+        return hit[1]
+    return is_tool_result_message((msg.get('message') or _EMPTY).get('content', []))
+
 # ====== HELPER FUNCTIONS FOR SPECIAL MESSAGE TYPES ======
 
 def strip_ansi_codes(text: str) -> str:
@@ -226,7 +337,7 @@ def _get_text_from_content(content) -> str:
 
 def _get_message_text(msg: Dict) -> str:
     """Extract text from a full message dict (top-level JSONL entry)."""
-    message_data = msg.get('message', {})
+    message_data = msg.get('message')
     if not message_data:
         return ''
     return _get_text_from_content(message_data.get('content', []))
@@ -463,6 +574,20 @@ def _coerce_json_dict(value):
 
 # ====== SPECIAL MESSAGE RENDERING FUNCTIONS ======
 
+def _short_id(value: str, default: str = 'N/A') -> str:
+    """Last 12 characters of a uuid / tool id, HTML-safe, for message footers.
+
+    Real ids are ASCII letters, digits, '-' and '_' (uuids, toolu_…), which need
+    no escaping, so escape() only runs for anything unexpected from the JSONL.
+    """
+    if not value:
+        return default
+    tail = value[-12:]
+    if tail.isascii() and tail.replace('-', '').replace('_', '').isalnum():
+        return tail
+    return escape(tail)
+
+
 def render_command_message(cmd_display: str, time_str: str, metadata_str: str, uuid: str, cwd: str) -> str:
     """Render a /command message with darker user-blue styling."""
     return f'''<div class="message user-msg command-msg">
@@ -471,7 +596,7 @@ def render_command_message(cmd_display: str, time_str: str, metadata_str: str, u
 </div>
 <div class="msg-content" style="color:#0066CC; background:#EBF2FF; border-left:3px solid #0066CC;">{escape(cmd_display)}</div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 {f'<span class="cwd-small">CWD: {escape(cwd)}</span>' if cwd else ''}
 </div>
 <div class="separator"></div>
@@ -486,7 +611,7 @@ def render_stdout_message(clean_text: str, time_str: str, metadata_str: str, uui
 </div>
 <div class="msg-content" style="color:#374151; background:#F9FAFB; border-left:3px solid #9CA3AF;">{escape_html_preserve_structure(clean_text)}</div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 {f'<span class="cwd-small">CWD: {escape(cwd)}</span>' if cwd else ''}
 </div>
 <div class="separator"></div>
@@ -703,13 +828,13 @@ def render_ask_result_block(items: list, tool_use_id: str, uuid: str) -> str:
 
     return f'''<div class="message user-msg ask-result-msg nav-always">
 <div class="msg-header">
-<span class="bullet" style="color:#D97706; font-size:14px;">&#10067;</span> <span class="label" style="color:#D97706;">[USER RESPONSE]</span> <span class="metadata">Tool ID: {escape(tool_use_id[-12:]) if tool_use_id else 'N/A'}</span>
+<span class="bullet" style="color:#D97706; font-size:14px;">&#10067;</span> <span class="label" style="color:#D97706;">[USER RESPONSE]</span> <span class="metadata">Tool ID: {_short_id(tool_use_id)}</span>
 </div>
 <div class="ask-inner">
 <div class="ask-body">{content}</div>
 </div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 </div>
 <div class="separator"></div>
 </div>
@@ -729,7 +854,7 @@ def render_user_rejection_block(rejection: dict, tool_use_id: str, uuid: str) ->
         return f'''<div class="message user-msg reject-msg nav-always">
 <div class="ask-inner" style="background:#FFF1F2; border-left:3px solid #F87171;">
 <div class="msg-header">
-<span class="bullet" style="color:#DC2626; font-size:14px;">&#10060;</span> <span class="label" style="color:#DC2626;">[REJECTED]</span> <span class="metadata">Tool ID: {escape(tool_use_id[-12:]) if tool_use_id else 'N/A'}</span>
+<span class="bullet" style="color:#DC2626; font-size:14px;">&#10060;</span> <span class="label" style="color:#DC2626;">[REJECTED]</span> <span class="metadata">Tool ID: {_short_id(tool_use_id)}</span>
 </div>
 <div style="padding:6px 12px; color:#1E1E1E; white-space:normal; margin-left:15px;">
 <div style="font-weight:700; color:#991B1B; margin-bottom:4px;">User feedback:</div>
@@ -737,7 +862,7 @@ def render_user_rejection_block(rejection: dict, tool_use_id: str, uuid: str) ->
 </div>
 </div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 </div>
 <div class="separator"></div>
 </div>
@@ -769,21 +894,20 @@ def render_compact_block(compact_data: dict) -> str:
 
     inner_content = '\n'.join(content_parts)
 
-    # Unique ID for toggle
-    block_id = f'compact-{uuid[-8:]}' if uuid else f'compact-{id(compact_data)}'
-
+    # Expand/collapse is handled by the page's delegated click listener on
+    # .compact-header, so the block needs no ids or inline handler.
     return f'''<div class="message compact-msg nav-always" data-msg-uuid="{escape(uuid)}">
 <div class="compact-inner">
-<div class="msg-header compact-header" onclick="(function(){{ var c=document.getElementById('{block_id}'); c.style.display = c.style.display==='none'?'block':'none'; var t=document.getElementById('{block_id}-toggle'); t.textContent = c.style.display==='none'? '\\u25B6':'\\u25BC'; }})()" style="cursor:pointer;">
-<span id="{block_id}-toggle" style="font-size:12px; color:#8B5CF6;">&#9654;</span>
+<div class="msg-header compact-header" style="cursor:pointer;">
+<span class="compact-toggle" style="font-size:12px; color:#8B5CF6;">&#9654;</span>
 <span class="bullet" style="color:#8B5CF6;">&#128230;</span> <span class="label" style="color:#7C3AED;">[COMPACT]</span> <span style="color:#6D28D9; font-size:13px; margin-left:8px;">{escape(command_display)}</span> <span class="metadata">{time_str}</span>
 </div>
-<div id="{block_id}" class="compact-content" style="display:none; max-height:600px; overflow-y:auto; padding:8px 12px; margin-left:15px;">
+<div class="compact-content" style="max-height:600px; overflow-y:auto; padding:8px 12px; margin-left:15px;">
 {inner_content}
 </div>
 </div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 </div>
 <div class="separator"></div>
 </div>
@@ -796,15 +920,18 @@ def group_compact_messages(messages: list) -> list:
     """Pre-process messages to group compact-related messages into single blocks.
     Returns a new list where compact groups are replaced by a single dict with _compact_group=True."""
     result = []
+    n_messages = len(messages)
     i = 0
-    while i < len(messages):
+    while i < n_messages:
         msg = messages[i]
-        text = _get_message_text(msg)
+        # Only real user messages can open a compact group; the message text is
+        # extracted for those alone (most entries are assistant/tool traffic).
+        text = ''
+        if (msg.get('message') or _EMPTY).get('role') == 'user' and not _entry_is_tool_result(msg):
+            text = _get_message_text(msg)
 
         # Check if this is a compact summary message
-        if (msg.get('message', {}).get('role') == 'user'
-                and not is_tool_result_message(msg.get('message', {}).get('content', []))
-                and is_compact_summary(text)):
+        if text and is_compact_summary(text):
 
             # Start collecting compact-related messages
             compact_data = {
@@ -820,11 +947,11 @@ def group_compact_messages(messages: list) -> list:
             # Look ahead for related messages (up to 5)
             j = i + 1
             lookahead = 0
-            while j < len(messages) and lookahead < 5:
+            while j < n_messages and lookahead < 5:
                 next_msg = messages[j]
                 next_text = _get_message_text(next_msg)
                 next_type = next_msg.get('type', '')
-                next_role = next_msg.get('message', {}).get('role', '')
+                next_role = (next_msg.get('message') or _EMPTY).get('role', '')
 
                 # Snapshots pass through (not consumed by compact)
                 if next_type == 'file-history-snapshot':
@@ -840,7 +967,7 @@ def group_compact_messages(messages: list) -> list:
                     continue
 
                 # Command with /compact: consume and record
-                if next_role == 'user' and not is_tool_result_message(next_msg.get('message', {}).get('content', [])):
+                if next_role == 'user' and not _entry_is_tool_result(next_msg):
                     cmd = parse_command_tags(next_text)
                     if cmd and 'compact' in cmd.get('name', '').lower():
                         compact_data['command_display'] = cmd['display']
@@ -870,20 +997,33 @@ def group_compact_messages(messages: list) -> list:
     return result
 
 
+# Rendered tool-result bodies kept by _escape_tool_result_text. Bodies can be
+# large, so the bound is kept small: it is there for the repeats (the same file
+# read again, the same git status), not to hold the whole chat. generate_html
+# empties it after each chat, and pool workers when they switch chats.
+TOOL_RESULT_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=TOOL_RESULT_CACHE_SIZE)
+def _escape_tool_result_text(text: str) -> str:
+    """escape_html_preserve_structure, memoised for tool-result bodies."""
+    return escape_html_preserve_structure(text)
+
+
 def format_tool_result_content(tool_result_data: Dict) -> str:
     """Format tool_result content - displays full content without truncation."""
     content = tool_result_data.get('content', '')
     tool_use_id = tool_result_data.get('tool_use_id', '')
 
-    if isinstance(content, str):
-        return escape_html_preserve_structure(content)
-    elif isinstance(content, list):
+    if type(content) is str:
+        return _escape_tool_result_text(content)
+    elif type(content) is list:
         parts = []
         for item in content:
-            if isinstance(item, dict):
+            if type(item) is dict:
                 if item.get('type') == 'text':
                     text = item.get('text', '')
-                    parts.append(escape_html_preserve_structure(text))
+                    parts.append(_escape_tool_result_text(text))
                 else:
                     parts.append(f"[{item.get('type')}]")
         return '<br>'.join(parts)
@@ -1146,83 +1286,95 @@ def _render_text_with_inline_images(text: str, images: list, nums: list) -> str:
     return re.sub(r'\[Image #(\d+)\]', repl, escaped)
 
 
+def _format_text_item(item: dict) -> str:
+    text = item.get('text', '')
+    if text.strip() == '(no content)':
+        return ''
+    return escape_html_preserve_structure(text)
+
+
+def _format_thinking_item(item: dict) -> str:
+    thinking_text = item.get('thinking', '')
+    first_line = escape(thinking_text.strip().split('\n')[0])
+    preview = f' <span class="thinking-preview">{first_line}...</span>' if first_line else '...'
+    return f'<details class="thinking"><summary>☉ Thinking:{preview}</summary><div class="thinking-content">{escape_html_preserve_structure(thinking_text)}</div></details>'
+
+
+def _format_tool_use_item(item: dict) -> str:
+    tool_name = item.get('name', 'unknown')
+    tool_id = item.get('id', '')
+    tool_input = _coerce_json_dict(item.get('input', {}))
+
+    # Special rendering for AskUserQuestion with structured Q&A
+    if tool_name == 'AskUserQuestion' and 'questions' in tool_input:
+        ask_html = render_ask_tool_use(tool_id, tool_input)
+        if ask_html:
+            return ask_html
+
+    # Special rendering for Edit / MultiEdit with diff view
+    if tool_name in ('Edit', 'MultiEdit'):
+        edit_html = render_edit_tool_use(tool_id, tool_name, tool_input)
+        if edit_html:
+            return edit_html
+
+    # Special rendering for Write — full-width block, blue accent
+    if tool_name == 'Write':
+        write_html = render_write_tool_use(tool_id, tool_input)
+        if write_html:
+            return write_html
+
+    input_str = '<br>'.join(f'{escape(key)}: {escape(str(value))}'
+                            for key, value in tool_input.items()) or '(no parameters)'
+
+    # Same structure as Edit/Write/Ask (white-space:normal, no leading newline
+    # or literal indent) so the top breathing room is identical across all tools.
+    return (
+        f'<details class="tool-use"><summary>Tool: {escape(tool_name)}</summary>'
+        f'<div class="tool-use-content" style="white-space:normal;">'
+        f'ID: {escape(tool_id[:16])}...<br>Parameters:<br>{input_str}'
+        f'</div></details>'
+    )
+
+
+def _format_image_item(item: dict) -> str:
+    source = item.get('source', {})
+    if type(source) is dict and source.get('type') == 'base64':
+        media = source.get('media_type', 'image/png')
+        data = source.get('data', '')
+        if data:
+            # Standalone button. When the user's text references the image
+            # with an [Image #N] marker, it is rendered inline instead (see
+            # _render_text_with_inline_images) and this button is skipped.
+            size_kb = max(1, len(data) * 3 // 4 // 1024)
+            return _image_link_html(data, media, size_kb, f'Open image ({media}, {size_kb} KB)')
+    return '<div class="unknown-type">[Image]</div>'
+
+
+# Renderer per content-item type: one hash lookup instead of a chain of string
+# compares. tool_result items are rendered by format_message_html itself.
+_CONTENT_ITEM_FORMATTERS = {
+    'text': _format_text_item,
+    'thinking': _format_thinking_item,
+    'tool_use': _format_tool_use_item,
+    'image': _format_image_item,
+    'tool_result': lambda item: '',
+}
+
+
 def format_content_item(item) -> str:
     """Format an individual content item."""
-    if isinstance(item, str):
+    if type(item) is str:
         return escape_html_preserve_structure(item)
 
-    if not isinstance(item, dict):
+    if type(item) is not dict:
         return str(item)
 
     item_type = item.get('type', '')
+    formatter = _CONTENT_ITEM_FORMATTERS.get(item_type) if type(item_type) is str else None
+    if formatter is not None:
+        return formatter(item)
 
-    if item_type == 'text':
-        text = item.get('text', '')
-        if text.strip() == '(no content)':
-            return ''
-        return escape_html_preserve_structure(text)
-
-    if item_type == 'thinking':
-        thinking_text = item.get('thinking', '')
-        first_line = escape(thinking_text.strip().split('\n')[0])
-        preview = f' <span class="thinking-preview">{first_line}...</span>' if first_line else '...'
-        return f'<details class="thinking"><summary>☉ Thinking:{preview}</summary><div class="thinking-content">{escape_html_preserve_structure(thinking_text)}</div></details>'
-
-    if item_type == 'tool_use':
-        tool_name = item.get('name', 'unknown')
-        tool_id = item.get('id', '')
-        tool_input = _coerce_json_dict(item.get('input', {}))
-
-        # Special rendering for AskUserQuestion with structured Q&A
-        if tool_name == 'AskUserQuestion' and 'questions' in tool_input:
-            ask_html = render_ask_tool_use(tool_id, tool_input)
-            if ask_html:
-                return ask_html
-
-        # Special rendering for Edit / MultiEdit with diff view
-        if tool_name in ('Edit', 'MultiEdit'):
-            edit_html = render_edit_tool_use(tool_id, tool_name, tool_input)
-            if edit_html:
-                return edit_html
-
-        # Special rendering for Write — full-width block, blue accent
-        if tool_name == 'Write':
-            write_html = render_write_tool_use(tool_id, tool_input)
-            if write_html:
-                return write_html
-
-        input_lines = []
-        for key, value in tool_input.items():
-            input_lines.append(f'{escape(key)}: {escape(str(value))}')
-
-        input_str = '<br>'.join(input_lines) if input_lines else '(no parameters)'
-
-        # Same structure as Edit/Write/Ask (white-space:normal, no leading newline
-        # or literal indent) so the top breathing room is identical across all tools.
-        return (
-            f'<details class="tool-use"><summary>Tool: {escape(tool_name)}</summary>'
-            f'<div class="tool-use-content" style="white-space:normal;">'
-            f'ID: {escape(tool_id[:16])}...<br>Parameters:<br>{input_str}'
-            f'</div></details>'
-        )
-
-    if item_type == 'image':
-        source = item.get('source', {})
-        if isinstance(source, dict) and source.get('type') == 'base64':
-            media = source.get('media_type', 'image/png')
-            data = source.get('data', '')
-            if data:
-                # Standalone button. When the user's text references the image
-                # with an [Image #N] marker, it is rendered inline instead (see
-                # _render_text_with_inline_images) and this button is skipped.
-                size_kb = max(1, len(data) * 3 // 4 // 1024)
-                return _image_link_html(data, media, size_kb, f'Open image ({media}, {size_kb} KB)')
-        return '<div class="unknown-type">[Image]</div>'
-
-    if item_type == 'tool_result':
-        return ''
-
-    return f'<div class="unknown-type">[Type: {item_type}]</div>'
+    return f'<div class="unknown-type">[Type: {escape(str(item_type))}]</div>'
 
 # Lines that are system/control text, not human conversation. Skipped when
 # labelling a rewind and when counting the real turns it discarded.
@@ -1270,15 +1422,11 @@ def format_message_html(msg: Dict, index: int, rewind_dest: dict = None) -> str:
         summary_text = msg.get('summary', '')
         leaf_uuid = msg.get('leafUuid', '')
         return f'''<div class="message summary-msg">
-<div class="summary-header">
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-CONVERSATION SUMMARY
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-</div>
+<div class="summary-header">CONVERSATION SUMMARY</div>
 <div class="summary-content">
 {escape(summary_text)}
 <br><br>
-<span class="uuid-small">Leaf UUID: {leaf_uuid[-12:]}</span>
+<span class="uuid-small">Leaf UUID: {_short_id(leaf_uuid, '')}</span>
 </div>
 </div>
 '''
@@ -1318,7 +1466,7 @@ CONVERSATION SUMMARY
                 f'</div>\n')
 
     # ====== HANDLE MESSAGES ======
-    message_data = msg.get('message', {})
+    message_data = msg.get('message')
     if not message_data:
         return ''
 
@@ -1333,8 +1481,10 @@ CONVERSATION SUMMARY
     if not content:
         return ''
 
+    is_tool_result = role == 'user' and _entry_is_tool_result(msg)
+
     # ====== DETECT SPECIAL USER MESSAGE TYPES ======
-    if role == 'user' and not is_tool_result_message(content):
+    if role == 'user' and not is_tool_result:
         text = _get_text_from_content(content)
 
         # Image-source reference lines: redundant text twin of an attached image
@@ -1381,16 +1531,16 @@ CONVERSATION SUMMARY
             return render_stdout_message(clean_text, time_str, metadata_str, uuid, cwd)
 
     # ====== DETECT TOOL_RESULT (NOT A REAL USER MESSAGE) ======
-    if role == 'user' and is_tool_result_message(content):
+    if is_tool_result:
         tool_results_html = []
         # Collect inline user comments (text items alongside tool_results)
         user_comments = []
         for item in content:
-            if isinstance(item, dict) and item.get('type') == 'text':
+            if type(item) is dict and item.get('type') == 'text':
                 comment = item.get('text', '').strip()
                 if comment:
                     user_comments.append(comment)
-            elif isinstance(item, dict) and item.get('type') == 'tool_result':
+            elif type(item) is dict and item.get('type') == 'tool_result':
                 result_text = _get_tool_result_text(item)
 
                 # AskUserQuestion result: prefer the structured toolUseResult,
@@ -1413,11 +1563,11 @@ CONVERSATION SUMMARY
 
                 tool_results_html.append(f'''<div class="tool-result-msg">
 <div class="msg-header">
-<span class="tool-result-toggle">&#9654;</span><span class="bullet">&#128228;</span> <span class="label">[TOOL RESULT]</span> <span class="metadata">Tool ID: {escape(tool_use_id[-12:])}</span>
+<span class="tool-result-toggle">&#9654;</span><span class="bullet">&#128228;</span> <span class="label">[TOOL RESULT]</span> <span class="metadata">Tool ID: {_short_id(tool_use_id, '')}</span>
 </div>
 <div class="msg-content">{result_content}</div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 </div>
 <div class="separator"></div>
 </div>''')
@@ -1433,7 +1583,7 @@ CONVERSATION SUMMARY
 <div style="padding:4px 12px; color:#1E1E1E; white-space:normal; margin-left:15px;">{comment_text}</div>
 </div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 </div>
 <div class="separator"></div>
 </div>''')
@@ -1467,29 +1617,38 @@ CONVERSATION SUMMARY
         meta_parts.append(f'[{escape(git_branch)}]')
     metadata_html = '  '.join(meta_parts)
 
-    # Process content (excluding tool_result handled above)
+    # Process content (excluding tool_result handled above). has_text tracks, in
+    # the same pass, whether there is any real text: messages made only of
+    # thinking/tool blocks are marked nav-skip.
     content_parts = []
+    has_text = False
 
-    if isinstance(content, str):
+    if type(content) is str:
+        has_text = bool(content.strip())
         content_parts.append(escape_html_preserve_structure(content))
-    elif isinstance(content, list):
+    elif type(content) is list:
         # F1: render [Image #N] markers inline as links. Each distinct marker maps to
         # one image by position (sorted markers <-> images in pasting order), so
         # non-consecutive numbers (#1 + #3) map correctly. The first `referenced`
         # images go inline; any extra image with no marker still gets its button.
-        imgs = [it for it in content if isinstance(it, dict) and it.get('type') == 'image']
+        imgs = [it for it in content if type(it) is dict and it.get('type') == 'image']
         full_text = ' '.join(it.get('text', '') for it in content
-                             if isinstance(it, dict) and it.get('type') == 'text')
+                             if type(it) is dict and it.get('type') == 'text')
         nums = sorted(set(int(n) for n in re.findall(r'\[Image #(\d+)\]', full_text)))
         inline_imgs = bool(imgs) and bool(nums)
         referenced = min(len(nums), len(imgs))
         shown_inline = 0
         for item in content:
-            if (inline_imgs and isinstance(item, dict) and item.get('type') == 'image'
+            if not has_text:
+                if type(item) is str:
+                    has_text = bool(item.strip())
+                elif type(item) is dict and item.get('type') == 'text':
+                    has_text = bool((item.get('text') or '').strip())
+            if (inline_imgs and type(item) is dict and item.get('type') == 'image'
                     and shown_inline < referenced):
                 shown_inline += 1
                 continue  # rendered inline inside the text
-            if inline_imgs and isinstance(item, dict) and item.get('type') == 'text':
+            if inline_imgs and type(item) is dict and item.get('type') == 'text':
                 formatted = _render_text_with_inline_images(item.get('text', ''), imgs, nums)
             else:
                 formatted = format_content_item(item)
@@ -1501,18 +1660,6 @@ CONVERSATION SUMMARY
     if not content_html.strip():
         return ''
 
-    # Mark messages that only contain thinking/tool blocks (no real text)
-    has_text = False
-    if isinstance(content, str) and content.strip():
-        has_text = True
-    elif isinstance(content, list):
-        for item in content:
-            if isinstance(item, str) and item.strip():
-                has_text = True
-                break
-            elif isinstance(item, dict) and item.get('type') == 'text' and (item.get('text') or '').strip():
-                has_text = True
-                break
     if not has_text:
         msg_class += ' nav-skip'
 
@@ -1522,7 +1669,7 @@ CONVERSATION SUMMARY
 </div>
 <div class="msg-content">{content_html}</div>
 <div class="msg-footer">
-<span class="uuid-small">ID: {escape(uuid[-12:]) if uuid else 'N/A'}</span>
+<span class="uuid-small">ID: {_short_id(uuid)}</span>
 {f'<span class="cwd-small">CWD: {escape(cwd)}</span>' if cwd else ''}
 </div>
 <div class="separator"></div>
@@ -1563,325 +1710,134 @@ def render_queued_message(msg, index, rewind_dest=None):
     return format_message_html(synthetic, index, rewind_dest)
 
 
-def generate_html(messages: List[Dict], output_file: str, dashboard_url: str = None, chat_title: str = "", chat_uuid: str = "", history_entries=None, time_format: str = "12h", agent_of: str = None):
-    """Generate the complete HTML document in terminal style.
+# Prev/next navigation controls of the search bar (mode selector, arrows,
+# counter). Omitted by generate_html for chats with nothing to navigate.
+_NAV_CONTROLS_HTML = """<div class="msg-nav">
+                <button class="nav-mode-btn active" id="navAll" title="All messages">
+                    <svg viewBox="0 0 24 24" width="14" height="14" fill="currentColor"><defs><linearGradient id="navGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" stop-color="#0066CC"/><stop offset="100%" stop-color="#10893E"/></linearGradient></defs><path d="M21 6h-2v9H6v2c0 .55.45 1 1 1h11l4 4V7c0-.55-.45-1-1-1zm-4 6V3c0-.55-.45-1-1-1H3c-.55 0-1 .45-1 1v14l4-4h10c.55 0 1-.45 1-1z"/></svg>
+                </button>
+                <button class="nav-mode-btn" id="navUser" title="User messages">
+                    <svg viewBox="0 0 24 24" width="14" height="14" fill="currentColor"><path d="M12 12c2.7 0 4.8-2.2 4.8-4.8S14.7 2.4 12 2.4 7.2 4.6 7.2 7.2 9.3 12 12 12zm0 2.4c-3.2 0-9.6 1.6-9.6 4.8v2.4h19.2v-2.4c0-3.2-6.4-4.8-9.6-4.8z"/></svg>
+                </button>
+                <button class="nav-mode-btn" id="navAssistant" title="Assistant messages">
+                    <svg viewBox="0 0 24 24" width="14" height="14" fill="currentColor"><path d="M20 9V7c0-1.1-.9-2-2-2h-3c0-1.66-1.34-3-3-3S9 3.34 9 5H6c-1.1 0-2 .9-2 2v2c-1.66 0-3 1.34-3 3s1.34 3 3 3v4c0 1.1.9 2 2 2h12c1.1 0 2-.9 2-2v-4c1.66 0 3-1.34 3-3s-1.34-3-3-3zM7.5 11.5c0-.83.67-1.5 1.5-1.5s1.5.67 1.5 1.5S9.83 13 9 13s-1.5-.67-1.5-1.5zM16 17H8v-2h8v2zm-1-4c-.83 0-1.5-.67-1.5-1.5S14.17 10 15 10s1.5.67 1.5 1.5S15.83 13 15 13z"/></svg>
+                </button>
+                <button class="nav-arrow-btn" id="prevMsg" title="Previous (P)">&#9650;</button>
+                <button class="nav-arrow-btn" id="nextMsg" title="Next (N)">&#9660;</button>
+                <span class="nav-counter" id="navCounter">0/0</span>
+            </div>"""
 
-    `history_entries`, when provided, is a list of /btw entries from
-    ~/.claude/history.jsonl. The ones matching `chat_uuid` are merged into the
-    flow as pseudo-messages styled in Claude cream so users can see /btw
-    queries that Claude Code doesn't persist as full Q+A any more.
+# Stylesheet of every chat page. Fully static, so it is a plain string rather
+# than part of the generate_html f-string: braces are written as-is and the
+# formatter never walks it.
+_CHAT_CSS = """\
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
 
-    `time_format` controls the time portion of timestamps: "12h" (AM/PM,
-    default) or "24h".
-    """
-    global TIME_FORMAT, _TASK_AGENT_LABELS
-    TIME_FORMAT = time_format if time_format in ("12h", "24h") else "12h"
-    _TASK_AGENT_LABELS = _chat_agent_labels(messages)
+        html, body {
+            height: 100%;
+        }
 
-    # Count statistics (distinguishing tool_results)
-    total_lines = len(messages)
-    real_user_msgs = 0
-    tool_result_msgs = 0
-    assistant_msgs = 0
-    summaries = 0
+        body {
+            font-family: 'Cascadia Code', 'Consolas', 'Monaco', 'Courier New', monospace;
+            background: #FFFFFF;
+            color: #1E1E1E;
+            line-height: 1.4;
+            font-size: 13px;
+            padding: 0;
+            margin: 0;
+            display: flex;
+            flex-direction: column;
+        }
 
-    for m in messages:
-        if m.get('type') == 'summary':
-            summaries += 1
-        elif is_queued_user_message(m):
-            real_user_msgs += 1
-        elif m.get('message', {}).get('role') == 'user':
-            content = m.get('message', {}).get('content', [])
-            if is_tool_result_message(content):
-                tool_result_msgs += 1
-            else:
-                text = _get_message_text(m)
-                if is_compact_summary(text):
-                    summaries += 1
-                else:
-                    real_user_msgs += 1
-        elif m.get('message', {}).get('role') == 'assistant':
-            assistant_msgs += 1
+        /* Loading overlay: hides the brief double-jump while the saved scroll /
+           state is restored on load; removed once restoration is done. */
+        .chat-loading {
+            position: fixed;
+            inset: 0;
+            z-index: 3000;
+            background: #FFFFFF;
+            display: flex;
+            flex-direction: column;
+            gap: 14px;
+            align-items: center;
+            justify-content: center;
+            transition: opacity 0.25s ease;
+        }
+        .chat-loading-msg { color: #9AA0A6; font-size: 13px; letter-spacing: 0.2px; }
+        .chat-loading.hidden { opacity: 0; pointer-events: none; }
+        .chat-loading-spin {
+            width: 28px;
+            height: 28px;
+            border: 3px solid rgba(0,0,0,0.12);
+            border-top-color: #999;
+            border-radius: 50%;
+            animation: chatSpin 0.7s linear infinite;
+        }
+        @keyframes chatSpin { to { transform: rotate(360deg); } }
 
-    # Pre-process: group compact-related messages, then inject /btw entries
-    # from history.jsonl (those matching this session) at their timestamps.
-    processed_messages = group_compact_messages(messages)
+        .container {
+            width: 100%;
+            background: #FFFFFF;
+            flex: 1;
+            display: flex;
+            flex-direction: column;
+            min-height: 0;
+        }
 
-    btw_for_session = []
-    if history_entries and chat_uuid:
-        btw_for_session = [e for e in history_entries if e.get('sessionId') == chat_uuid]
-    if btw_for_session:
-        processed_messages = merge_btw_history_into_messages(processed_messages, btw_for_session)
+        .terminal-header {
+            background: #2D2D30;
+            color: #CCCCCC;
+            padding: 8px 15px;
+            font-size: 13px;
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+        }
 
-    btw_count = sum(1 for m in processed_messages if isinstance(m, dict) and m.get('_btw_inline_history'))
+        .terminal-title {
+            font-weight: 600;
+            display: flex;
+            align-items: center;
+            gap: 10px;
+        }
 
-    # F3: detect conversation rewinds. A real rewind = an abandoned prompt with
-    # human text whose parent has a LATER sibling that is also human text (the
-    # retry); forks made only of tool_use/tool_result are ignored. The label is
-    # the nearest ancestor with human text; N is how many human messages sit
-    # between that destination and the rewind marker ON SCREEN (the snapshot's
-    # position) — i.e. how far up the Go button scrolls. Measuring the abandoned
-    # branch instead gave huge, confusing counts when the destination is right
-    # above (e.g. two retries of the same prompt showing "24 messages back").
-    msg_nodes = {}
-    siblings = {}
-    for idx, m in enumerate(messages):
-        if isinstance(m, dict) and m.get('uuid') and m.get('type') in ('user', 'assistant', 'system'):
-            u = m['uuid']
-            msg_nodes[u] = {'parent': m.get('parentUuid'), 'idx': idx, 'line': _first_human_line(m)}
-            siblings.setdefault(m.get('parentUuid'), []).append((idx, u))
+        .chat-name {
+            color: #FFFFFF;
+            font-weight: 500;
+            font-size: 13px;
+        }
 
-    def _rewind_destination(prompt_uuid):
-        node = msg_nodes.get(prompt_uuid)
-        if not node or not node['line']:
-            return None  # the abandoned prompt must itself be human text
-        later = [si for si, su in siblings.get(node['parent'], [])
-                 if su != prompt_uuid and si > node['idx'] and msg_nodes[su]['line']]
-        if not later:
-            return None  # no human retry after it -> active branch, not a rewind
-        cur, seen = node['parent'], set()
-        while cur and cur in msg_nodes and cur not in seen:
-            seen.add(cur)
-            if msg_nodes[cur]['line']:
-                return cur
-            cur = msg_nodes[cur]['parent']
-        return None
+        .chat-name-sep {
+            color: #666;
+        }
 
-    rewind_dest = {}
-    for snap_idx, m in enumerate(messages):
-        if isinstance(m, dict) and m.get('type') == 'file-history-snapshot':
-            mid = m.get('messageId', '')
-            if mid and mid not in rewind_dest:
-                dest = _rewind_destination(mid)
-                if dest:
-                    dest_idx = msg_nodes[dest]['idx']
-                    n_back = sum(1 for nd in msg_nodes.values()
-                                 if dest_idx < nd['idx'] < snap_idx and nd['line'])
-                    rewind_dest[mid] = (dest, msg_nodes[dest]['line'], n_back)
+        .terminal-controls {
+            display: flex;
+            gap: 8px;
+        }
 
-    # Generate HTML for all messages
-    messages_html = []
-    shown_rewind_mids = set()
-    for i, msg in enumerate(processed_messages):
-        # F3: render only snapshots that are real rewinds (skip guards/duplicates)
-        if isinstance(msg, dict) and msg.get('type') == 'file-history-snapshot':
-            mid = msg.get('messageId', '')
-            if mid not in rewind_dest or mid in shown_rewind_mids:
-                continue
-            shown_rewind_mids.add(mid)
-        # Compact groups are rendered directly
-        if isinstance(msg, dict) and msg.get('_compact_group'):
-            msg_html = render_compact_block(msg)
-        elif isinstance(msg, dict) and msg.get('_btw_inline_history'):
-            msg_html = render_btw_history_message(msg)
-        elif is_queued_user_message(msg):
-            msg_html = render_queued_message(msg, i, rewind_dest)
-        else:
-            msg_html = format_message_html(msg, i, rewind_dest)
-        if msg_html:
-            messages_html.append(msg_html)
+        .terminal-btn {
+            width: 12px;
+            height: 12px;
+            border-radius: 50%;
+            display: inline-block;
+        }
 
-    messages_content = '\n'.join(messages_html)
+        .btn-close { background: #E81123; }
+        .btn-minimize { background: #FFB900; }
+        .btn-maximize { background: #10893E; }
 
-    # Extract chat date and time (converted to local timezone)
-    chat_timestamp = get_chat_timestamp(messages)
-    if chat_timestamp:
-        try:
-            dt = datetime.fromisoformat(chat_timestamp.replace('Z', '+00:00')).astimezone()
-            # Date format follows the chosen time format: 24h -> DD/MM/YYYY
-            # (European), 12h -> MM/DD/YYYY (US, consistent with AM/PM).
-            date_fmt = '%m/%d/%Y' if TIME_FORMAT == '12h' else '%d/%m/%Y'
-            chat_date = dt.strftime(date_fmt)
-            chat_time = dt.strftime(_time_pattern())
-        except (ValueError, TypeError):
-            chat_date = "N/A"
-            chat_time = "N/A"
-    else:
-        chat_date = "N/A"
-        chat_time = "N/A"
+        .header-actions {
+            display: flex;
+            gap: 10px;
+            align-items: center;
+        }
 
-    # Build header action buttons
-    header_actions_parts = []
-    if dashboard_url:
-        header_actions_parts.append(
-            f'<a href="{escape(dashboard_url)}" class="header-btn" title="Back to Dashboard">&#9664; Dashboard</a>'
-        )
-    header_actions_parts.append(
-        '<a href="https://github.com/oskar-gm/code-chat-viewer/issues" target="_blank" rel="noopener" class="header-btn feedback" title="Report an issue or send feedback on GitHub">Feedback</a>'
-    )
-    header_actions_parts.append(
-        '<a href="https://github.com/oskar-gm/code-chat-viewer/releases/latest" target="_blank" rel="noopener" class="header-btn release" title="Latest release — check for updates">Latest release</a>'
-    )
-    header_actions_html = '\n                '.join(header_actions_parts)
-
-    # JS string literal for the per-chat sessionStorage key (safely quoted).
-    chat_state_key = json.dumps(chat_uuid or "")
-
-    # Complete HTML template in terminal style
-    html_template = f'''<!DOCTYPE html>
-<!--
-=============================================================================
-Code Chat Viewer v{APP_VERSION} - Professional Chat Log HTML Exporter
-Generated HTML Visualization
-=============================================================================
-
-Created with: Code Chat Viewer
-Repository: https://github.com/oskar-gm/code-chat-viewer
-Website: https://nucleoia.es
-License: MIT License
-
-This HTML file was generated by Code Chat Viewer, an open-source tool
-for converting Claude Code, VS Code, and Visual Studio Code chat logs (JSONL)
-into readable, professional HTML visualizations with terminal-style aesthetics.
-
-Learn more: https://github.com/oskar-gm/code-chat-viewer
-Developer: https://nucleoia.es
-
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-=============================================================================
--->
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-
-    <!-- SEO Meta Tags -->
-    <meta name="description" content="Claude Code conversation visualization - Convert JSONL chat logs to professional HTML. Export AI coding conversations with terminal-style UI, collapsible tool results, conversation filter, and interactive dashboard. Works with Claude Code, VS Code, and AI coding assistants.">
-    <meta name="keywords" content="Claude Code, Claude Code history, chat history, conversation history, claude code chat history, chat viewer, conversation export, JSONL to HTML, AI chat visualization, Claude Code logs, export claude code chats, chat log viewer, VS Code chat export, developer tools, Claude AI, AI conversation viewer, terminal UI, chat dashboard">
-
-    <meta name="generator" content="Code Chat Viewer v{APP_VERSION} - https://github.com/oskar-gm/code-chat-viewer">
-    <meta name="robots" content="index, follow">
-    <meta name="language" content="English, Spanish">
-
-    <!-- Open Graph / Social Media Meta Tags -->
-    <meta property="og:type" content="article">
-    <meta property="og:title" content="Claude Code Conversation - Professional Terminal Visualization">
-    <meta property="og:description" content="Professional visualization of Claude Code chat logs. Convert JSONL to HTML with terminal-style aesthetics. Created with Code Chat Viewer.">
-    <meta property="og:url" content="https://github.com/oskar-gm/code-chat-viewer">
-    <meta property="og:site_name" content="Code Chat Viewer">
-    <meta property="og:locale" content="en_US">
-    <meta property="og:locale:alternate" content="es_ES">
-
-    <!-- Twitter Card -->
-    <meta name="twitter:card" content="summary">
-    <meta name="twitter:title" content="Claude Code Conversation Visualization">
-    <meta name="twitter:description" content="Professional HTML export from Claude Code JSONL chat logs">
-
-    <!-- Author & Publisher -->
-    <link rel="author" href="https://nucleoia.es">
-    <link rel="canonical" href="https://github.com/oskar-gm/code-chat-viewer">
-    <meta name="publisher" content="nucleoia.es">
-
-    <link rel="icon" type="image/png" href="data:image/png;base64,{ICON_FAVICON_BASE64}">
-    <title>{escape(chat_title) + ' - ' if chat_title else ''}Code Chat Viewer</title>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-
-        html, body {{
-            height: 100%;
-        }}
-
-        body {{
-            font-family: 'Cascadia Code', 'Consolas', 'Monaco', 'Courier New', monospace;
-            background: #FFFFFF;
-            color: #1E1E1E;
-            line-height: 1.4;
-            font-size: 13px;
-            padding: 0;
-            margin: 0;
-            display: flex;
-            flex-direction: column;
-        }}
-
-        /* Loading overlay: hides the brief double-jump while the saved scroll /
-           state is restored on load; removed once restoration is done. */
-        .chat-loading {{
-            position: fixed;
-            inset: 0;
-            z-index: 3000;
-            background: #FFFFFF;
-            display: flex;
-            flex-direction: column;
-            gap: 14px;
-            align-items: center;
-            justify-content: center;
-            transition: opacity 0.25s ease;
-        }}
-        .chat-loading-msg {{ color: #9AA0A6; font-size: 13px; letter-spacing: 0.2px; }}
-        .chat-loading.hidden {{ opacity: 0; pointer-events: none; }}
-        .chat-loading-spin {{
-            width: 28px;
-            height: 28px;
-            border: 3px solid rgba(0,0,0,0.12);
-            border-top-color: #999;
-            border-radius: 50%;
-            animation: chatSpin 0.7s linear infinite;
-        }}
-        @keyframes chatSpin {{ to {{ transform: rotate(360deg); }} }}
-
-        .container {{
-            width: 100%;
-            background: #FFFFFF;
-            flex: 1;
-            display: flex;
-            flex-direction: column;
-            min-height: 0;
-        }}
-
-        .terminal-header {{
-            background: #2D2D30;
-            color: #CCCCCC;
-            padding: 8px 15px;
-            font-size: 13px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }}
-
-        .terminal-title {{
-            font-weight: 600;
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }}
-
-        .chat-name {{
-            color: #FFFFFF;
-            font-weight: 500;
-            font-size: 13px;
-        }}
-
-        .chat-name-sep {{
-            color: #666;
-        }}
-
-        .terminal-controls {{
-            display: flex;
-            gap: 8px;
-        }}
-
-        .terminal-btn {{
-            width: 12px;
-            height: 12px;
-            border-radius: 50%;
-            display: inline-block;
-        }}
-
-        .btn-close {{ background: #E81123; }}
-        .btn-minimize {{ background: #FFB900; }}
-        .btn-maximize {{ background: #10893E; }}
-
-        .header-actions {{
-            display: flex;
-            gap: 10px;
-            align-items: center;
-        }}
-
-        .header-btn {{
+        .header-btn {
             color: #CCCCCC;
             text-decoration: none;
             font-size: 11px;
@@ -1890,37 +1846,37 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border-radius: 3px;
             transition: all 0.15s;
             white-space: nowrap;
-        }}
+        }
 
-        .header-btn:hover {{
+        .header-btn:hover {
             background: #444;
             border-color: #888;
             color: #FFF;
-        }}
+        }
 
-        .header-btn.feedback {{
+        .header-btn.feedback {
             border-color: #007ACC;
             color: #7EC8F0;
-        }}
+        }
 
-        .header-btn.feedback:hover {{
+        .header-btn.feedback:hover {
             background: #007ACC;
             border-color: #007ACC;
             color: #FFF;
-        }}
+        }
 
-        .header-btn.release {{
+        .header-btn.release {
             border-color: #10893E;
             color: #6BCB8B;
-        }}
+        }
 
-        .header-btn.release:hover {{
+        .header-btn.release:hover {
             background: #10893E;
             border-color: #10893E;
             color: #FFF;
-        }}
+        }
 
-        .stats-bar {{
+        .stats-bar {
             background: #F3F3F3;
             border-bottom: 1px solid #E0E0E0;
             padding: 6px 15px;
@@ -1928,18 +1884,18 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             color: #666;
             display: flex;
             justify-content: space-between;
-        }}
+        }
 
-        .search-bar {{
+        .search-bar {
             background: #FAFAFA;
             border-bottom: 1px solid #E0E0E0;
             padding: 8px 15px;
             display: flex;
             align-items: center;
             gap: 15px;
-        }}
+        }
 
-        .search-input {{
+        .search-input {
             flex: 1;
             padding: 8px 12px;
             border: 1px solid #CCCCCC;
@@ -1947,15 +1903,15 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             font-family: inherit;
             font-size: 13px;
             background: white;
-        }}
+        }
 
-        .search-input:focus {{
+        .search-input:focus {
             outline: none;
             border-color: #007ACC;
             box-shadow: 0 0 0 1px #007ACC;
-        }}
+        }
 
-        .filter-toggle {{
+        .filter-toggle {
             display: inline-flex;
             align-items: center;
             gap: 5px;
@@ -1964,23 +1920,23 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             cursor: pointer;
             white-space: nowrap;
             user-select: none;
-        }}
-        .filter-toggle input {{
+        }
+        .filter-toggle input {
             cursor: pointer;
             margin: 0;
             accent-color: #007ACC;
-        }}
+        }
 
-        .toolbar-divider {{
+        .toolbar-divider {
             width: 1px;
             height: 22px;
             background: #DDDDDD;
             flex-shrink: 0;
-        }}
+        }
 
         /* User message navigation */
 
-        .msg-nav {{
+        .msg-nav {
             display: flex;
             align-items: center;
             gap: 4px;
@@ -1988,9 +1944,9 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border: 1px solid #CCCCCC;
             border-radius: 4px;
             padding: 3px 8px;
-        }}
+        }
 
-        .nav-mode-btn {{
+        .nav-mode-btn {
             background: none;
             border: 1px solid transparent;
             border-radius: 3px;
@@ -2002,32 +1958,32 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             align-items: center;
             justify-content: center;
             transition: all 0.15s;
-        }}
+        }
 
-        .nav-mode-btn:hover {{
+        .nav-mode-btn:hover {
             color: #333;
             background: #F0F0F0;
-        }}
+        }
 
-        .nav-mode-btn.active#navUser {{
+        .nav-mode-btn.active#navUser {
             color: #0066CC;
             border-color: #0066CC;
             background: #F0F7FF;
-        }}
-        .nav-mode-btn.active#navAssistant {{
+        }
+        .nav-mode-btn.active#navAssistant {
             color: #10893E;
             border-color: #10893E;
             background: #F0FFF4;
-        }}
-        .nav-mode-btn.active#navAll {{
+        }
+        .nav-mode-btn.active#navAll {
             border-color: #0077AA;
             background: linear-gradient(135deg, #F0F7FF, #F0FFF4);
-        }}
-        .nav-mode-btn.active#navAll svg path {{
+        }
+        .nav-mode-btn.active#navAll svg path {
             fill: url(#navGrad);
-        }}
+        }
 
-        .nav-arrow-btn {{
+        .nav-arrow-btn {
             background: #F0F0F0;
             border: 1px solid #CCCCCC;
             border-radius: 3px;
@@ -2040,61 +1996,68 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             align-items: center;
             justify-content: center;
             transition: all 0.15s;
-        }}
+        }
 
-        .nav-arrow-btn:hover {{
+        .nav-arrow-btn:hover {
             background: #0066CC;
             border-color: #0066CC;
             color: white;
-        }}
+        }
 
-        .nav-arrow-btn:active {{
+        .nav-arrow-btn:active {
             transform: scale(0.95);
-        }}
+        }
 
-        .nav-counter {{
+        .nav-counter {
             font-size: 11px;
             color: #666;
             min-width: 35px;
             text-align: center;
             font-family: 'Consolas', monospace;
-        }}
+        }
+
+        /* Conversation filter: one class per element instead of inline styles.
+           The marks only apply while the container has .filtering, so clearing
+           the filter is a single class change on the container. */
+        .filtering .hidden-by-search {
+            display: none !important;
+        }
 
         /* Message highlight during navigation */
-        .message.user-msg.nav-highlight {{
+        .message.user-msg.nav-highlight {
             animation: navPulseUser 1.5s ease-out;
-        }}
-        .message.assistant-msg.nav-highlight {{
+        }
+        .message.assistant-msg.nav-highlight {
             animation: navPulseAssistant 1.5s ease-out;
-        }}
-
-        @keyframes navPulseUser {{
-            0% {{ box-shadow: 0 0 0 0 rgba(0, 102, 204, 0.5); }}
-            50% {{ box-shadow: 0 0 0 8px rgba(0, 102, 204, 0.2); }}
-            100% {{ box-shadow: 0 0 0 0 rgba(0, 102, 204, 0); }}
-        }}
-        @keyframes navPulseAssistant {{
-            0% {{ box-shadow: 0 0 0 0 rgba(16, 137, 62, 0.5); }}
-            50% {{ box-shadow: 0 0 0 8px rgba(16, 137, 62, 0.2); }}
-            100% {{ box-shadow: 0 0 0 0 rgba(16, 137, 62, 0); }}
-        }}
-
-        .terminal-content {{
+        }
+
+        @keyframes navPulseUser {
+            0% { box-shadow: 0 0 0 0 rgba(0, 102, 204, 0.5); }
+            50% { box-shadow: 0 0 0 8px rgba(0, 102, 204, 0.2); }
+            100% { box-shadow: 0 0 0 0 rgba(0, 102, 204, 0); }
+        }
+        @keyframes navPulseAssistant {
+            0% { box-shadow: 0 0 0 0 rgba(16, 137, 62, 0.5); }
+            50% { box-shadow: 0 0 0 8px rgba(16, 137, 62, 0.2); }
+            100% { box-shadow: 0 0 0 0 rgba(16, 137, 62, 0); }
+        }
+
+        .terminal-content {
             padding: 6px 12px;
             flex: 1;
             min-height: 0;
             overflow-y: auto;
             background: #FFFFFF;
-        }}
+        }
 
-        .message {{
+        .message {
             position: relative;
             margin-bottom: 4px;
             font-size: 13px;
             line-height: 1.4;
-        }}
+        }
 
-        .copy-btn {{
+        .copy-btn {
             position: absolute;
             top: -1px;
             right: 4px;
@@ -2106,22 +2069,22 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             color: #6B7280;
             transition: opacity 0.12s, color 0.12s;
             line-height: 0;
-        }}
-        .copy-btn:hover {{
+        }
+        .copy-btn:hover {
             opacity: 1;
             color: #1E5BAA;
-        }}
-        .copy-btn.copied {{
+        }
+        .copy-btn.copied {
             color: #10893E;
             opacity: 1;
-        }}
-        .copy-btn svg {{
+        }
+        .copy-btn svg {
             width: 14px;
             height: 14px;
             display: block;
-        }}
+        }
 
-        .msg-image-link.inline-img {{
+        .msg-image-link.inline-img {
             display: inline-block;
             background: #D6E6FB;
             color: #1A4F8A;
@@ -2132,10 +2095,10 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             text-decoration: none;
             cursor: pointer;
             transition: background 0.12s;
-        }}
-        .msg-image-link.inline-img:hover {{
+        }
+        .msg-image-link.inline-img:hover {
             background: #BBD4F5;
-        }}
+        }
 
         /* User/Assistant/Command/Stdout/Reject/Task: their `.msg-header` is a
            direct child of `.message` (no inner box). Indent it by 11px so the
@@ -2144,68 +2107,68 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
            that 11px inset, so this selector skips it. The ask-result header IS a
            direct child here, so it aligns like user/assistant; tool-result has no
            `.message` wrapper at all. */
-        .message > .msg-header {{
+        .message > .msg-header {
             padding-left: 11px;
-        }}
+        }
 
-        .msg-header {{
+        .msg-header {
             display: flex;
             align-items: baseline;
             margin-bottom: 2px;
             gap: 6px;
             padding-right: 30px;
-        }}
+        }
 
-        .bullet {{
+        .bullet {
             font-weight: bold;
             font-size: 13px;
             margin-right: 3px;
-        }}
+        }
 
         /* Higher specificity to prevent CSS cascade conflicts */
-        .message.user-msg .bullet {{
+        .message.user-msg .bullet {
             color: #0066CC;
-        }}
+        }
 
-        .assistant-msg .bullet {{
+        .assistant-msg .bullet {
             color: #10893E;
-        }}
+        }
 
-        .label {{
+        .label {
             font-weight: 700;
             color: #1E1E1E;
             font-size: 12px;
-        }}
+        }
 
         .user-msg .label,
-        .assistant-msg .label {{
+        .assistant-msg .label {
             font-size: 12px;
             letter-spacing: 0.3px;
-        }}
+        }
 
-        .metadata {{
+        .metadata {
             color: #999;
             font-size: 11px;
             margin-left: auto;
-        }}
-        .metadata strong {{
+        }
+        .metadata strong {
             color: #555555;
             font-weight: 700;
-        }}
+        }
 
-        .msg-content {{
+        .msg-content {
             padding-left: 15px;
             color: #1E1E1E;
             white-space: pre-wrap;
             word-wrap: break-word;
-        }}
+        }
 
-        .tool-result-msg .msg-content {{
+        .tool-result-msg .msg-content {
             padding-left: 10px;
-        }}
+        }
 
         /* Higher specificity to prevent CSS cascade conflicts */
-        .message.user-msg .msg-content {{
+        .message.user-msg .msg-content {
             padding: 4px 10px;
             color: #0066CC;
             background: #F8FBFF;
@@ -2214,9 +2177,9 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             margin-left: 12px;
             font-size: 13px;
             line-height: 1.4;
-        }}
+        }
 
-        .assistant-msg .msg-content {{
+        .assistant-msg .msg-content {
             padding: 4px 10px;
             color: #1E1E1E;
             background: #FAFFF8;
@@ -2225,27 +2188,27 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             margin-left: 12px;
             font-size: 13px;
             line-height: 1.4;
-        }}
+        }
 
         /* Tool-result: no envelope box on the wrapper itself. The header sits
            at the same X as the user/assistant headers (padding-left: 11px).
            The collapsible content gets its own gray box + orange border with
            margin-left to align with .msg-content of user/assistant. */
-        .tool-result-msg {{
+        .tool-result-msg {
             margin-bottom: 4px;
-        }}
+        }
 
-        .tool-result-msg > .msg-header {{
+        .tool-result-msg > .msg-header {
             padding-left: 11px;
             cursor: pointer;
             user-select: none;
-        }}
+        }
 
-        .tool-result-msg > .msg-header:hover {{
+        .tool-result-msg > .msg-header:hover {
             opacity: 0.85;
-        }}
+        }
 
-        .tool-result-msg > .msg-content {{
+        .tool-result-msg > .msg-content {
             display: none;
             background: #F8F8F8;
             border-left: 3px solid #FF6B00;
@@ -2254,25 +2217,25 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border-radius: 3px;
             color: #333;
             font-size: 12px;
-        }}
+        }
 
-        .tool-result-msg > .msg-content.expanded {{
+        .tool-result-msg > .msg-content.expanded {
             display: block;
-        }}
+        }
 
-        .tool-result-toggle {{
+        .tool-result-toggle {
             display: inline-block;
             font-size: 10px;
             color: #FF6B00;
             margin-right: 4px;
             transition: transform 0.15s;
-        }}
+        }
 
-        .tool-result-toggle.expanded {{
+        .tool-result-toggle.expanded {
             transform: rotate(90deg);
-        }}
+        }
 
-        .thinking {{
+        .thinking {
             background: #FFFFFF;
             border-left: 3px solid #B8C8B8;
             margin: 3px 0;
@@ -2282,24 +2245,24 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             box-shadow: 0 1px 4px rgba(0,0,0,0.12);
             font-size: 12px;
             line-height: 1.4;
-        }}
-        .thinking summary {{
+        }
+        .thinking summary {
             padding: 4px 8px;
             cursor: pointer;
             user-select: none;
             white-space: nowrap;
             overflow: hidden;
             text-overflow: ellipsis;
-        }}
-        .thinking[open] .thinking-preview {{
+        }
+        .thinking[open] .thinking-preview {
             display: none;
-        }}
-        .thinking-content {{
+        }
+        .thinking-content {
             padding: 6px 8px 5px;
             border-top: 1px solid #E0E8E0;
-        }}
+        }
 
-        .tool-use {{
+        .tool-use {
             background: #48484A;
             border-left: 3px solid #6A6A6C;
             margin: 3px 0;
@@ -2308,82 +2271,82 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             box-shadow: 0 1px 3px rgba(0,0,0,0.2);
             font-size: 12px;
             line-height: 1.4;
-        }}
-        .tool-use summary {{
+        }
+        .tool-use summary {
             padding: 4px 8px;
             cursor: pointer;
             user-select: none;
-        }}
-        .tool-use-content {{
+        }
+        .tool-use-content {
             padding: 6px 8px 5px;
             border-top: 1px solid #5A5A5C;
             word-wrap: break-word;
             overflow-wrap: break-word;
-        }}
+        }
 
-        .tool-use-hint {{
+        .tool-use-hint {
             color: #9A9A9C;
             font-weight: 400;
             font-size: 12px;
-        }}
+        }
 
         /* ====== Edit / MultiEdit diff view ====== */
-        .edit-diff-container {{
+        .edit-diff-container {
             margin-top: 8px;
-        }}
+        }
         /* Let the .tool-use-content padding own the vertical breathing room so
            Edit/Write match the generic tool block and thinking (6px top / 5px
            bottom). Without this, the last .edit-diff/.write-block margin-bottom
            stacks on the padding and leaves 11px below vs 6px above. */
-        .edit-diff-container > :first-child {{
+        .edit-diff-container > :first-child {
             margin-top: 0;
-        }}
-        .edit-diff-container > :last-child {{
+        }
+        .edit-diff-container > :last-child {
             margin-bottom: 0;
-        }}
+        }
 
-        .edit-diff {{
+        .edit-diff {
             display: grid;
             grid-template-columns: 1fr 1fr;
             gap: 8px;
             margin: 6px 0;
-        }}
+        }
 
-        .edit-diff-col {{
+        .edit-diff-col {
             background: #3A3A3C;
             border-radius: 4px;
             overflow: hidden;
             display: flex;
             flex-direction: column;
             min-width: 0;
-        }}
+        }
 
-        .edit-diff-old {{
+        .edit-diff-old {
             border-left: 3px solid #D16969;
-        }}
+        }
 
-        .edit-diff-new {{
+        .edit-diff-new {
             border-left: 3px solid #6AB06F;
-        }}
+        }
 
-        .edit-diff-head {{
+        .edit-diff-head {
             padding: 4px 8px;
             font-size: 11px;
             font-weight: 600;
             background: rgba(0,0,0,0.22);
             border-bottom: 1px solid rgba(0,0,0,0.3);
             font-family: 'Consolas', 'Courier New', monospace;
-        }}
+        }
 
-        .edit-diff-old .edit-diff-head {{
+        .edit-diff-old .edit-diff-head {
             color: #FFB3B3;
-        }}
+        }
 
-        .edit-diff-new .edit-diff-head {{
+        .edit-diff-new .edit-diff-head {
             color: #B3F0BD;
-        }}
+        }
 
-        .edit-diff-body {{
+        .edit-diff-body {
             padding: 8px;
             margin: 0;
             font-family: 'Consolas', 'Courier New', monospace;
@@ -2394,25 +2357,25 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             overflow-x: auto;
             max-height: 420px;
             overflow-y: auto;
-        }}
+        }
 
-        .edit-diff-old .edit-diff-body {{
+        .edit-diff-old .edit-diff-body {
             color: #FFB3B3;
-        }}
+        }
 
-        .edit-diff-new .edit-diff-body {{
+        .edit-diff-new .edit-diff-body {
             color: #B3F0BD;
-        }}
+        }
 
-        .edit-diff-label {{
+        .edit-diff-label {
             font-size: 11px;
             color: #BBB;
             margin: 10px 0 4px;
             font-family: 'Consolas', 'Courier New', monospace;
             letter-spacing: 0.5px;
-        }}
+        }
 
-        .edit-replace-all {{
+        .edit-replace-all {
             background: #5A5A5C;
             color: #FFD699;
             padding: 1px 6px;
@@ -2421,36 +2384,36 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             font-weight: 500;
             margin-left: 4px;
             letter-spacing: 0.3px;
-        }}
+        }
 
         /* Light theme (toggle A) */
-        body.edit-diff-light .edit-diff-old {{
+        body.edit-diff-light .edit-diff-old {
             background: #FFE4E4;
             border-left-color: #C42B1C;
-        }}
-        body.edit-diff-light .edit-diff-new {{
+        }
+        body.edit-diff-light .edit-diff-new {
             background: #DFF7E0;
             border-left-color: #107C10;
-        }}
-        body.edit-diff-light .edit-diff-old .edit-diff-head {{
+        }
+        body.edit-diff-light .edit-diff-old .edit-diff-head {
             background: rgba(196,43,28,0.14);
             color: #8B0000;
             border-bottom-color: rgba(196,43,28,0.22);
-        }}
-        body.edit-diff-light .edit-diff-new .edit-diff-head {{
+        }
+        body.edit-diff-light .edit-diff-new .edit-diff-head {
             background: rgba(16,124,16,0.14);
             color: #0A5F0A;
             border-bottom-color: rgba(16,124,16,0.22);
-        }}
-        body.edit-diff-light .edit-diff-old .edit-diff-body {{
+        }
+        body.edit-diff-light .edit-diff-old .edit-diff-body {
             color: #8B0000;
-        }}
-        body.edit-diff-light .edit-diff-new .edit-diff-body {{
+        }
+        body.edit-diff-light .edit-diff-new .edit-diff-body {
             color: #0A5F0A;
-        }}
+        }
 
         /* ====== Write tool: full-width block, blue accent ====== */
-        .write-block {{
+        .write-block {
             background: #3A3A3C;
             border-radius: 4px;
             overflow: hidden;
@@ -2459,8 +2422,8 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             min-width: 0;
             border-left: 3px solid #4A90E2;
             margin: 6px 0;
-        }}
-        .write-block-head {{
+        }
+        .write-block-head {
             padding: 4px 8px;
             font-size: 11px;
             font-weight: 600;
@@ -2468,8 +2431,8 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border-bottom: 1px solid rgba(0,0,0,0.3);
             font-family: 'Consolas', 'Courier New', monospace;
             color: #A8C8FF;
-        }}
-        .write-block-body {{
+        }
+        .write-block-body {
             padding: 8px;
             margin: 0;
             font-family: 'Consolas', 'Courier New', monospace;
@@ -2481,87 +2444,87 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             max-height: 420px;
             overflow-y: auto;
             color: #A8C8FF;
-        }}
-        body.edit-diff-light .write-block {{
+        }
+        body.edit-diff-light .write-block {
             background: #E4EEFB;
             border-left-color: #1E5BAA;
-        }}
-        body.edit-diff-light .write-block-head {{
+        }
+        body.edit-diff-light .write-block-head {
             background: rgba(30,91,170,0.14);
             color: #0B3F86;
             border-bottom-color: rgba(30,91,170,0.22);
-        }}
-        body.edit-diff-light .write-block-body {{
+        }
+        body.edit-diff-light .write-block-body {
             color: #0B3F86;
-        }}
+        }
 
         /* ====== /btw injected from history.jsonl ====== */
         .btw-history-msg .msg-content,
-        .btw-history-content {{
+        .btw-history-content {
             background: #F4F0E8 !important;
             color: #1E1E1E !important;
             border-left: 3px solid #C76A4D !important;
-        }}
-        .btw-history-msg .label {{
+        }
+        .btw-history-msg .label {
             color: #9A4A2E !important;
-        }}
-        .btw-history-msg .bullet {{
+        }
+        .btw-history-msg .bullet {
             color: #C76A4D !important;
-        }}
-        .btw-history-note {{
+        }
+        .btw-history-note {
             color: #9A4A2E;
             font-size: 10px;
             font-style: italic;
             margin-left: 6px;
             opacity: 0.85;
-        }}
+        }
 
-        @media (max-width: 900px) {{
-            .edit-diff {{
+        @media (max-width: 900px) {
+            .edit-diff {
                 grid-template-columns: 1fr;
-            }}
-        }}
+            }
+        }
 
         /* ====== Edit controls in search bar ====== */
-        .edit-ctrl-group {{
+        .edit-ctrl-group {
             display: inline-flex;
             gap: 2px;
             align-items: center;
-        }}
+        }
 
-        .edit-ctrl-group .edit-ctrl-btn {{
+        .edit-ctrl-group .edit-ctrl-btn {
             border-radius: 0;
-        }}
+        }
 
-        .edit-ctrl-group .edit-ctrl-btn:first-child {{
+        .edit-ctrl-group .edit-ctrl-btn:first-child {
             border-top-left-radius: 3px;
             border-bottom-left-radius: 3px;
-        }}
+        }
 
-        .edit-ctrl-group .edit-ctrl-btn:last-child {{
+        .edit-ctrl-group .edit-ctrl-btn:last-child {
             border-top-right-radius: 3px;
             border-bottom-right-radius: 3px;
-        }}
+        }
 
         /* The theme toggle previews the CURRENT diff theme: a dark button while
            the diff is dark, a light/cream one once switched to light. The label
            says where a click takes you ("Switch to …"). Scoped to
            .edit-ctrl-group so it outweighs the generic .edit-ctrl-btn rules
            without touching the neighbouring Edits/Writes button. */
-        .edit-ctrl-group .edit-ctrl-btn-theme {{
+        .edit-ctrl-group .edit-ctrl-btn-theme {
             border-left-width: 0 !important;
             background: #5E5E5E;
             border-color: #787878;
             color: #F5F5F5;
             min-width: 122px;
             justify-content: center;
-        }}
-        .edit-ctrl-group .edit-ctrl-btn-theme:hover {{
+        }
+        .edit-ctrl-group .edit-ctrl-btn-theme:hover {
             background: #6B6B6B;
             border-color: #888888;
-        }}
+        }
 
-        .edit-ctrl-btn {{
+        .edit-ctrl-btn {
             background: #F0F0F0;
             border: 1px solid #CCCCCC;
             border-radius: 3px;
@@ -2576,44 +2539,44 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             font-family: inherit;
             transition: all 0.15s;
             white-space: nowrap;
-        }}
+        }
 
-        .edit-ctrl-btn:hover {{
+        .edit-ctrl-btn:hover {
             background: #E4E4E4;
             border-color: #AAA;
-        }}
+        }
 
-        .edit-ctrl-btn:active {{
+        .edit-ctrl-btn:active {
             transform: scale(0.97);
-        }}
+        }
 
-        .edit-ctrl-btn .edit-ctrl-icon {{
+        .edit-ctrl-btn .edit-ctrl-icon {
             font-size: 10px;
             font-family: 'Consolas', monospace;
             line-height: 1;
-        }}
+        }
 
-        .edit-ctrl-group .edit-ctrl-btn-theme.is-light {{
+        .edit-ctrl-group .edit-ctrl-btn-theme.is-light {
             background: #FFF5E1;
             border-color: #E0B060;
             color: #7A4E00;
-        }}
-        .edit-ctrl-group .edit-ctrl-btn-theme.is-light:hover {{
+        }
+        .edit-ctrl-group .edit-ctrl-btn-theme.is-light:hover {
             background: #FBEFD0;
             border-color: #D4A050;
-        }}
+        }
 
         /* ====== Chat UUID in header ====== */
-        .chat-uuid-wrap {{
+        .chat-uuid-wrap {
             display: inline-flex;
             align-items: stretch;
             background: rgba(255,255,255,0.04);
             border: 1px solid #444;
             border-radius: 3px;
             overflow: hidden;
-        }}
+        }
 
-        .chat-uuid {{
+        .chat-uuid {
             font-family: 'Consolas', 'Courier New', monospace;
             font-size: 11px;
             color: #9AAFC4;
@@ -2622,9 +2585,9 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             letter-spacing: 0.3px;
             white-space: nowrap;
             line-height: 18px;
-        }}
+        }
 
-        .chat-uuid-copy {{
+        .chat-uuid-copy {
             background: none;
             border: none;
             border-left: 1px solid #444;
@@ -2637,57 +2600,62 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             transition: all 0.15s;
             font-family: 'Consolas', 'Courier New', monospace;
             font-size: 10px;
-        }}
+        }
 
-        .chat-uuid-copy:hover {{
+        .chat-uuid-copy:hover {
             background: rgba(255,255,255,0.08);
             color: #FFF;
-        }}
+        }
 
-        .chat-uuid-copy.copied {{
+        .chat-uuid-copy.copied {
             color: #6AB06F;
-        }}
+        }
 
-        @media (max-width: 900px) {{
-            .chat-uuid-wrap {{
+        @media (max-width: 900px) {
+            .chat-uuid-wrap {
                 display: none;
-            }}
-        }}
+            }
+        }
 
-        .msg-footer {{
+        .msg-footer {
             padding-left: 12px;
             margin-top: 1px;
             font-size: 10px;
             color: #BBB;
             display: flex;
             gap: 16px;
-        }}
+        }
 
-        .separator {{
+        .separator {
             border-top: 1px solid #EEEEEE;
             margin: 5px 0 0;
-        }}
+        }
 
-        .summary-msg {{
+        .summary-msg {
             background: #F8F8F8;
             border: 1px solid #E0E0E0;
             padding: 6px 10px;
             margin: 6px 0;
-        }}
+        }
 
-        .summary-header {{
+        /* Title between two heavy rules, drawn as borders (not box-drawing text) */
+        .summary-header {
             color: #666;
             font-size: 11px;
             margin-bottom: 4px;
-            letter-spacing: -0.5px;
-        }}
-
-        .summary-content {{
+            padding: 3px 0;
+            width: 330px;
+            max-width: 100%;
+            border-top: 2px solid #666;
+            border-bottom: 2px solid #666;
+        }
+
+        .summary-content {
             color: #1E1E1E;
             padding-left: 8px;
-        }}
+        }
 
-        .rewind {{
+        .rewind {
             display: flex;
             align-items: center;
             gap: 5px;
@@ -2698,29 +2666,29 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             margin: 4px 0;
             font-size: 13px;
             color: #0F766E;
-        }}
+        }
         /* Everything keeps its size; only the destination shrinks + ellipsises,
            so the rewind stays on a single line at any width. */
-        .rewind-icon, .rewind-label, .rewind-sep, .rewind-count, .rewind-goto {{
+        .rewind-icon, .rewind-label, .rewind-sep, .rewind-count, .rewind-goto {
             flex-shrink: 0;
-        }}
-        .rewind-icon {{
+        }
+        .rewind-icon {
             font-size: 15px;
             color: #0F766E;
             line-height: 1;
-        }}
-        .rewind-label {{
+        }
+        .rewind-label {
             font-weight: 600;
             color: #0F766E;
-        }}
-        .rewind-sep {{
+        }
+        .rewind-sep {
             color: #3F9189;
-        }}
-        .rewind-count {{
+        }
+        .rewind-count {
             color: #3F6E68;
             font-size: 12px;
-        }}
-        .rewind-dest {{
+        }
+        .rewind-dest {
             flex: 1 1 auto;
             min-width: 0;
             overflow: hidden;
@@ -2728,8 +2696,8 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             white-space: nowrap;
             color: #115E59;
             font-style: italic;
-        }}
-        .rewind-goto {{
+        }
+        .rewind-goto {
             display: inline-flex;
             align-items: center;
             gap: 4px;
@@ -2741,17 +2709,17 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             padding: 2px 9px 2px 7px;
             border-radius: 3px;
             transition: background 0.12s;
-        }}
-        .rewind-goto:hover {{
+        }
+        .rewind-goto:hover {
             background: #CCFBF1;
-        }}
-        .rewind-arrow {{
+        }
+        .rewind-arrow {
             width: 12px;
             height: 12px;
             display: block;
-        }}
+        }
 
-        .system-reminder {{
+        .system-reminder {
             display: inline-block;
             color: #C2410C;
             background: #FFF7ED;
@@ -2761,9 +2729,9 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border-radius: 4px;
             font-size: 12px;
             white-space: normal;
-        }}
+        }
 
-        .request-interrupted {{
+        .request-interrupted {
             display: inline-block;
             color: #DC2626;
             background: #FFF1F2;
@@ -2773,41 +2741,41 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border-radius: 4px;
             font-weight: 600;
             font-size: 12px;
-        }}
+        }
 
         /* Bash commands sent with "!" in Claude Code (and their output) */
-        .bash-bang {{ color: #C0392B; font-weight: 600; }}
-        .bash-out {{ color: #5A6270; }}
-        .bash-err {{ color: #C0392B; }}
-        .agent-open {{
+        .bash-bang { color: #C0392B; font-weight: 600; }
+        .bash-out { color: #5A6270; }
+        .bash-err { color: #C0392B; }
+        .agent-open {
             display: inline-block; margin-left: 8px; padding: 1px 8px;
             background: #E7F7EE; color: #157347; border: 1px solid #A6E3C4;
             border-radius: 10px; font-size: 11px; font-weight: 600; text-decoration: none;
             vertical-align: middle;
-        }}
-        .agent-open:hover {{ background: #CFEEDD; }}
+        }
+        .agent-open:hover { background: #CFEEDD; }
 
-        .img-modal {{
+        .img-modal {
             display: none;
             position: fixed; top: 0; right: 0; bottom: 0; left: 0;
             background: rgba(0,0,0,0.55);
             z-index: 1000;
             justify-content: center; align-items: center;
             padding: 20px;
-        }}
-        .img-modal.open {{ display: flex; }}
-        .img-modal-img {{
+        }
+        .img-modal.open { display: flex; }
+        .img-modal-img {
             max-width: 92vw; max-height: 88vh;
             object-fit: contain;
             border-radius: 4px;
             box-shadow: 0 4px 24px rgba(0,0,0,0.5);
-        }}
-        .img-modal-figure {{
+        }
+        .img-modal-figure {
             position: relative;
             display: inline-block;
             line-height: 0;
-        }}
-        .img-modal-close {{
+        }
+        .img-modal-close {
             position: absolute; top: 8px; right: 8px;
             background: rgba(0,0,0,0.55); border: none;
             color: #FFFFFF; font-size: 28px; line-height: 1;
@@ -2816,11 +2784,11 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             display: flex; align-items: center; justify-content: center;
             text-shadow: 0 1px 3px rgba(0,0,0,0.9);
             z-index: 1;
-        }}
-        .img-modal-close:hover {{ color: #FCA5A5; background: rgba(0,0,0,0.75); }}
-        .img-modal-close:focus-visible {{ outline: 2px solid #FFFFFF; outline-offset: 2px; }}
+        }
+        .img-modal-close:hover { color: #FCA5A5; background: rgba(0,0,0,0.75); }
+        .img-modal-close:focus-visible { outline: 2px solid #FFFFFF; outline-offset: 2px; }
 
-        .nav-toast {{
+        .nav-toast {
             position: fixed;
             bottom: 24px; left: 50%;
             transform: translateX(-50%) translateY(8px);
@@ -2829,34 +2797,34 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             font-size: 13px; box-shadow: 0 4px 16px rgba(0,0,0,0.3);
             opacity: 0; transition: opacity 0.25s, transform 0.25s;
             z-index: 1100; pointer-events: none;
-        }}
-        .nav-toast.show {{
+        }
+        .nav-toast.show {
             opacity: 1; transform: translateX(-50%) translateY(0);
-        }}
+        }
 
-        .uuid-small, .cwd-small {{
+        .uuid-small, .cwd-small {
             font-family: 'Consolas', monospace;
             font-size: 9px;
-        }}
+        }
 
-        .footer {{
+        .footer {
             background: #F3F3F3;
             border-top: 1px solid #E0E0E0;
             padding: 8px 15px;
             text-align: center;
             color: #666;
             font-size: 12px;
-        }}
+        }
 
         /* Base styling for unknown content types */
-        .unknown-type {{
+        .unknown-type {
             color: #999;
             font-style: italic;
             padding: 5px 0;
-        }}
+        }
 
         /* Blue theme for unknown-type elements inside user messages */
-        .user-msg .unknown-type {{
+        .user-msg .unknown-type {
             color: #0066CC;
             background: #F0F7FF;
             padding: 8px 12px;
@@ -2864,56 +2832,62 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border-left: 2px solid #0066CC;
             display: inline-block;
             font-style: italic;
-        }}
+        }
 
         /* Command messages */
-        .command-msg {{
+        .command-msg {
             margin-bottom: 8px;
-        }}
+        }
 
         /* Compact messages */
-        .compact-msg {{
+        .compact-msg {
             margin-bottom: 4px;
-        }}
-        .compact-inner {{
+        }
+        .compact-inner {
             background: #F5F3FF;
             border-left: 3px solid #8B5CF6;
             padding: 4px 8px;
             border-radius: 3px;
-        }}
-        .compact-msg .compact-header {{
+        }
+        .compact-msg .compact-header {
             display: flex;
             align-items: center;
             gap: 8px;
-        }}
-        .compact-msg .compact-header:hover {{
+        }
+        .compact-msg .compact-header:hover {
             opacity: 0.85;
-        }}
+        }
+        .compact-msg .compact-content {
+            display: none;
+        }
+        .compact-msg .compact-content.expanded {
+            display: block;
+        }
 
         /* AskUserQuestion result */
-        .ask-result-msg {{
+        .ask-result-msg {
             margin-bottom: 4px;
-        }}
-        .ask-inner {{
+        }
+        .ask-inner {
             background: #FFFBEB;
             border-left: 3px solid #FCD34D;
             padding: 4px 8px;
             border-radius: 3px;
             margin-left: 12px;
-        }}
-        .ask-body {{
+        }
+        .ask-body {
             padding: 4px 12px;
             color: #451A03;
             white-space: normal;
-        }}
-        .ask-q {{
+        }
+        .ask-q {
             display: flex;
             flex-wrap: wrap;
             align-items: baseline;
             gap: 6px;
             margin: 2px 0 4px;
-        }}
-        .ask-chip {{
+        }
+        .ask-chip {
             display: inline-block;
             background: #F59E0B;
             color: #3A2206;
@@ -2923,13 +2897,13 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             text-transform: uppercase;
             padding: 1px 6px;
             border-radius: 4px;
-        }}
-        .ask-q-text {{
+        }
+        .ask-q-text {
             color: #78350F;
             font-weight: 600;
             font-size: 12px;
-        }}
-        .agent-chip {{
+        }
+        .agent-chip {
             display: inline-block;
             background: #7C3AED;
             color: #FFFFFF;
@@ -2940,50 +2914,50 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             border-radius: 4px;
             margin-left: 8px;
             vertical-align: middle;
-        }}
-        .ask-opts {{
+        }
+        .ask-opts {
             margin-top: 2px;
-        }}
-        .ask-opt {{
+        }
+        .ask-opt {
             display: flex;
             align-items: flex-start;
             gap: 6px;
             padding: 2px 0;
             color: #6E5A3E;
             font-size: 12px;
-        }}
-        .ask-opt-mark {{
+        }
+        .ask-opt-mark {
             flex-shrink: 0;
             color: #C9A86A;
             font-size: 11px;
             line-height: 1.5;
-        }}
-        .ask-opt-body {{
+        }
+        .ask-opt-body {
             min-width: 0;
-        }}
-        .ask-opt-sel {{
+        }
+        .ask-opt-sel {
             background: #FEF3C7;
             border-left: 2px solid #D97706;
             border-radius: 3px;
             padding: 3px 6px;
             margin: 1px 0;
             color: #5B3410;
-        }}
-        .ask-opt-sel .ask-opt-mark {{
+        }
+        .ask-opt-sel .ask-opt-mark {
             color: #B45309;
             font-weight: 700;
-        }}
-        .ask-opt-sel .ask-opt-label {{
+        }
+        .ask-opt-sel .ask-opt-label {
             color: #92400E;
             font-weight: 700;
-        }}
-        .ask-opt-desc {{
+        }
+        .ask-opt-desc {
             color: #6E5A3E;
             font-size: 11px;
             line-height: 1.35;
             margin-top: 2px;
-        }}
-        .ask-free {{
+        }
+        .ask-free {
             background: #FEF3C7;
             border-left: 2px solid #D97706;
             border-radius: 3px;
@@ -2992,19 +2966,19 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             color: #7C2D12;
             font-weight: 600;
             font-size: 12px;
-        }}
-        .ask-free-mark {{
+        }
+        .ask-free-mark {
             color: #B45309;
             font-weight: 700;
             margin-right: 2px;
-        }}
-        .ask-note {{
+        }
+        .ask-note {
             color: #6E5A3E;
             font-style: italic;
             font-size: 11px;
             margin-top: 3px;
-        }}
-        .ask-md {{
+        }
+        .ask-md {
             background: #FFF7ED;
             color: #78350F;
             padding: 8px;
@@ -3015,505 +2989,638 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             overflow-x: auto;
             white-space: pre;
             border: 1px solid #FDE68A;
-        }}
-        .ask-sep {{
+        }
+        .ask-sep {
             border-top: 1px solid #FDE68A;
             margin: 8px 0;
-        }}
+        }
 
         /* Stdout messages */
-        .stdout-msg {{
+        .stdout-msg {
             margin-bottom: 8px;
-        }}
+        }
 
         /* Nav-always highlight animations (specific per type) */
-        .message.compact-msg.nav-highlight {{
+        .message.compact-msg.nav-highlight {
             animation: navPulseCompact 1.5s ease-out;
-        }}
-        .message.ask-result-msg.nav-highlight {{
+        }
+        .message.ask-result-msg.nav-highlight {
             animation: navPulseAsk 1.5s ease-out;
-        }}
-        .message.reject-msg.nav-highlight {{
+        }
+        .message.reject-msg.nav-highlight {
             animation: navPulseReject 1.5s ease-out;
-        }}
-        @keyframes navPulseCompact {{
-            0% {{ box-shadow: 0 0 0 0 rgba(139, 92, 246, 0.5); }}
-            50% {{ box-shadow: 0 0 0 8px rgba(139, 92, 246, 0.2); }}
-            100% {{ box-shadow: 0 0 0 0 rgba(139, 92, 246, 0); }}
-        }}
-        @keyframes navPulseAsk {{
-            0% {{ box-shadow: 0 0 0 0 rgba(217, 119, 6, 0.5); }}
-            50% {{ box-shadow: 0 0 0 8px rgba(217, 119, 6, 0.2); }}
-            100% {{ box-shadow: 0 0 0 0 rgba(217, 119, 6, 0); }}
-        }}
-        @keyframes navPulseReject {{
-            0% {{ box-shadow: 0 0 0 0 rgba(220, 38, 38, 0.5); }}
-            50% {{ box-shadow: 0 0 0 8px rgba(220, 38, 38, 0.2); }}
-            100% {{ box-shadow: 0 0 0 0 rgba(220, 38, 38, 0); }}
-        }}
+        }
+        @keyframes navPulseCompact {
+            0% { box-shadow: 0 0 0 0 rgba(139, 92, 246, 0.5); }
+            50% { box-shadow: 0 0 0 8px rgba(139, 92, 246, 0.2); }
+            100% { box-shadow: 0 0 0 0 rgba(139, 92, 246, 0); }
+        }
+        @keyframes navPulseAsk {
+            0% { box-shadow: 0 0 0 0 rgba(217, 119, 6, 0.5); }
+            50% { box-shadow: 0 0 0 8px rgba(217, 119, 6, 0.2); }
+            100% { box-shadow: 0 0 0 0 rgba(217, 119, 6, 0); }
+        }
+        @keyframes navPulseReject {
+            0% { box-shadow: 0 0 0 0 rgba(220, 38, 38, 0.5); }
+            50% { box-shadow: 0 0 0 8px rgba(220, 38, 38, 0.2); }
+            100% { box-shadow: 0 0 0 0 rgba(220, 38, 38, 0); }
+        }
 
         /* Custom scrollbar */
-        .terminal-content::-webkit-scrollbar {{
+        .terminal-content::-webkit-scrollbar {
             width: 12px;
-        }}
+        }
 
-        .terminal-content::-webkit-scrollbar-track {{
+        .terminal-content::-webkit-scrollbar-track {
             background: #F0F0F0;
-        }}
+        }
 
-        .terminal-content::-webkit-scrollbar-thumb {{
+        .terminal-content::-webkit-scrollbar-thumb {
             background: #C0C0C0;
             border-radius: 6px;
-        }}
+        }
 
-        .terminal-content::-webkit-scrollbar-thumb:hover {{
+        .terminal-content::-webkit-scrollbar-thumb:hover {
             background: #A0A0A0;
-        }}
+        }
 
         /* Responsive */
-        @media (max-width: 768px) {{
-            body {{
+        @media (max-width: 768px) {
+            body {
                 padding: 0;
-            }}
+            }
 
-            .container {{
+            .container {
                 border: none;
-            }}
+            }
 
-            .terminal-content {{
+            .terminal-content {
                 padding: 10px;
-            }}
+            }
 
-            .msg-content {{
+            .msg-content {
                 padding-left: 10px;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div id="chatLoading" class="chat-loading"><div class="chat-loading-spin"></div><div class="chat-loading-msg">Loading your chat… hang tight!</div></div>
-    <div class="container">
-        <div class="terminal-header">
-            <div class="terminal-title">
-                <img src="data:image/png;base64,{ICON_BASE64}" alt="" style="height:16px;width:16px;vertical-align:middle;margin-right:6px;" onerror="this.style.display='none'">
-                <span>Code Chat Viewer</span>
-                <span class="app-version" style="color:#777;font-size:11px;margin-left:8px;">v{APP_VERSION}</span>
-                {'<span class="chat-name-sep">|</span><span class="chat-name">' + escape(chat_title) + '</span>' if chat_title else ''}
-                {('<span class="agent-chip" title="Agent chat &mdash; a sub-chat launched by the Task tool, invoked by session ' + escape(agent_of) + '">AGENT CHAT</span>') if agent_of else ''}
-            </div>
-            <div class="header-actions">
-                {('<span class="chat-uuid-wrap" title="Chat UUID"><span class="chat-uuid">' + escape(chat_uuid) + '</span><button class="chat-uuid-copy" onclick="copyChatUuid(this)" title="Copy UUID"><svg xmlns=\"http://www.w3.org/2000/svg\" width=\"12\" height=\"12\" viewBox=\"0 0 24 24\" fill=\"none\" stroke=\"currentColor\" stroke-width=\"2\" stroke-linecap=\"round\" stroke-linejoin=\"round\"><rect x=\"9\" y=\"9\" width=\"13\" height=\"13\" rx=\"2\" ry=\"2\"/><path d=\"M5 15H4a2 2 0 0 1-2-2V4a2 2 0 0 1 2-2h9a2 2 0 0 1 2 2v1\"/></svg></button></span>') if chat_uuid else ''}
-                {header_actions_html}
-            </div>
-            <div class="terminal-controls">
-                <span class="terminal-btn btn-close"></span>
-                <span class="terminal-btn btn-minimize"></span>
-                <span class="terminal-btn btn-maximize"></span>
-            </div>
-        </div>
-
-        <div class="stats-bar">
-            <div>
-                Total: {total_lines} lines |
-                User: {real_user_msgs} |
-                Assistant: {assistant_msgs} |
-                Tool Results: {tool_result_msgs} |
-                Summaries: {summaries} |
-                Rewinds: {len(rewind_dest)} |
-                BTW: {btw_count}
-            </div>
-            <div>
-                Created: {chat_date} {chat_time}
-            </div>
-        </div>
-
-        <div class="search-bar">
-            <input type="text" class="search-input" id="searchInput" placeholder="Filter conversation..." autocomplete="off" autocorrect="off" autocapitalize="off" spellcheck="false">
-            <label class="filter-toggle" title="Show only user and assistant messages (hide tools, thinking, compacts, snapshots...)">
-                <input type="checkbox" id="messagesOnly">
-                <span>Messages only</span>
-            </label>
-            <span class="toolbar-divider"></span>
-            <div class="edit-ctrl-group">
-                <button class="edit-ctrl-btn" id="editToggleCollapse" title="Expand / collapse all Edit and Write blocks">
-                    <span class="edit-ctrl-icon" id="editToggleIcon">&#9654;</span>
-                    <span>Edits/Writes</span>
-                </button>
-                <button class="edit-ctrl-btn edit-ctrl-btn-theme" id="editToggleTheme" title="Switch the Edit/Write diff theme between dark and light">
-                    <span id="editToggleThemeLabel">Switch to light</span>
-                </button>
-            </div>
-            <div class="msg-nav">
-                <button class="nav-mode-btn active" id="navAll" title="All messages">
-                    <svg viewBox="0 0 24 24" width="14" height="14" fill="currentColor"><defs><linearGradient id="navGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" stop-color="#0066CC"/><stop offset="100%" stop-color="#10893E"/></linearGradient></defs><path d="M21 6h-2v9H6v2c0 .55.45 1 1 1h11l4 4V7c0-.55-.45-1-1-1zm-4 6V3c0-.55-.45-1-1-1H3c-.55 0-1 .45-1 1v14l4-4h10c.55 0 1-.45 1-1z"/></svg>
-                </button>
-                <button class="nav-mode-btn" id="navUser" title="User messages">
-                    <svg viewBox="0 0 24 24" width="14" height="14" fill="currentColor"><path d="M12 12c2.7 0 4.8-2.2 4.8-4.8S14.7 2.4 12 2.4 7.2 4.6 7.2 7.2 9.3 12 12 12zm0 2.4c-3.2 0-9.6 1.6-9.6 4.8v2.4h19.2v-2.4c0-3.2-6.4-4.8-9.6-4.8z"/></svg>
-                </button>
-                <button class="nav-mode-btn" id="navAssistant" title="Assistant messages">
-                    <svg viewBox="0 0 24 24" width="14" height="14" fill="currentColor"><path d="M20 9V7c0-1.1-.9-2-2-2h-3c0-1.66-1.34-3-3-3S9 3.34 9 5H6c-1.1 0-2 .9-2 2v2c-1.66 0-3 1.34-3 3s1.34 3 3 3v4c0 1.1.9 2 2 2h12c1.1 0 2-.9 2-2v-4c1.66 0 3-1.34 3-3s-1.34-3-3-3zM7.5 11.5c0-.83.67-1.5 1.5-1.5s1.5.67 1.5 1.5S9.83 13 9 13s-1.5-.67-1.5-1.5zM16 17H8v-2h8v2zm-1-4c-.83 0-1.5-.67-1.5-1.5S14.17 10 15 10s1.5.67 1.5 1.5S15.83 13 15 13z"/></svg>
-                </button>
-                <button class="nav-arrow-btn" id="prevMsg" title="Previous (P)">&#9650;</button>
-                <button class="nav-arrow-btn" id="nextMsg" title="Next (N)">&#9660;</button>
-                <span class="nav-counter" id="navCounter">0/0</span>
-            </div>
-        </div>
-
-        <div class="terminal-content" id="terminalContent">
-{messages_content}
-        </div>
-
-        <div class="footer">
-            <a href="https://github.com/oskar-gm/code-chat-viewer" target="_blank" style="color: #666; text-decoration: none;">Code Chat Viewer</a> |
-            Processed {len(messages_html)} elements from {total_lines} total lines |
-            <a href="https://github.com/oskar-gm/code-chat-viewer/issues" target="_blank" rel="noopener" style="color: #666; text-decoration: none;">Feedback</a>
-        </div>
-    </div>
+            }
+        }
+"""
 
-    <script>
+# Client-side behaviour of every chat page (navigation, filter, state
+# persistence, image modal, copy buttons). Kept as a plain string — not part of
+# the generate_html f-string — so braces are written as-is and the script is not
+# re-processed per chat. generate_html injects it after declaring CHAT_STATE_KEY
+# and NAV_ENABLED.
+_CHAT_JS = """\
         // ====== MESSAGE NAVIGATION ======
         let navMessages = [];
         let currentNavIndex = -1;
         let navMode = 'all';
         let observerActive = true;
         let navObserver = null;
+        // At most one message carries .nav-highlight; remember it so a jump
+        // clears one node instead of sweeping the whole list.
+        let lastHighlighted = null;
+        // Nodes the scroll, navigation and search paths touch on every event,
+        // looked up once (the script runs after the body has been parsed).
+        const chatContainer = document.getElementById('terminalContent');
+        const navCounterEl = document.getElementById('navCounter');
+        const searchInputEl = document.getElementById('searchInput');
+        const messagesOnlyEl = document.getElementById('messagesOnly');
+
+        function setNavHighlight(el) {
+            if (lastHighlighted) lastHighlighted.classList.remove('nav-highlight');
+            el.classList.add('nav-highlight');
+            lastHighlighted = el;
+        }
 
         // ====== STATE PERSISTENCE (per-open, sessionStorage) ======
         // Persists the controls a reader expects to survive a refresh (F5): scroll
         // position, theme of the Edit/Write diffs, the user/bot/all selector, the
-        // search box + "Messages only", and which Edit/Write blocks are open. Uses
+        // search box + "Messages only", and which Edit/Write blocks and tool
+        // results are open, so a refresh doesn't re-collapse them. Uses
         // sessionStorage on purpose — state survives a reload but is wiped when the
         // tab closes, so reopening the chat starts clean. Thinking and other
         // non-button <details> are never persisted.
-        const CHAT_STATE_KEY = 'ccv-chat-state-' + {chat_state_key};
+        // CHAT_STATE_KEY (the per-chat key) and NAV_ENABLED are declared by
+        // generate_html just before this block — the only per-chat values.
         // Memory survives a refresh (F5 / back-forward) but a fresh open starts
         // clean. sessionStorage alone isn't enough — a file:// reopen can reuse it
         // — so the navigation type is the reliable signal: wipe this chat's saved
         // state unless we arrived here by reloading.
-        (function() {{
+        (function() {
             var t = '';
-            try {{ var e = performance.getEntriesByType('navigation'); t = e && e[0] ? e[0].type : ''; }} catch (err) {{}}
-            if (t !== 'reload' && t !== 'back_forward') {{
-                try {{ sessionStorage.removeItem(CHAT_STATE_KEY); }} catch (err) {{}}
-            }}
-        }})();
-        function loadChatState() {{
-            try {{ return JSON.parse(sessionStorage.getItem(CHAT_STATE_KEY)) || {{}}; }}
-            catch (e) {{ return {{}}; }}
-        }}
-        function saveChatState(patch) {{
-            try {{
+            try { var e = performance.getEntriesByType('navigation'); t = e && e[0] ? e[0].type : ''; } catch (err) {}
+            if (t !== 'reload' && t !== 'back_forward') {
+                try { sessionStorage.removeItem(CHAT_STATE_KEY); } catch (err) {}
+            }
+        })();
+        function loadChatState() {
+            try { return JSON.parse(sessionStorage.getItem(CHAT_STATE_KEY)) || {}; }
+            catch (e) { return {}; }
+        }
+        function saveChatState(patch) {
+            try {
                 var s = loadChatState();
-                for (var k in patch) {{ s[k] = patch[k]; }}
+                for (var k in patch) { s[k] = patch[k]; }
                 sessionStorage.setItem(CHAT_STATE_KEY, JSON.stringify(s));
-            }} catch (e) {{}}
-        }}
-        function saveEditBlocksState() {{
+            } catch (e) {}
+        }
+        function saveEditBlocksState() {
             var blocks = document.querySelectorAll('details.tool-use-edit, details.tool-use-write');
             var open = [];
-            blocks.forEach(function(d, i) {{ if (d.open) open.push(i); }});
-            saveChatState({{ editBlocksOpen: open }});
-        }}
-        function restoreChatState() {{
+            blocks.forEach(function(d, i) { if (d.open) open.push(i); });
+            saveChatState({ editBlocksOpen: open });
+        }
+        function saveToolResultsState() {
+            var contents = document.querySelectorAll('.tool-result-msg > .msg-content');
+            var open = [];
+            for (var i = 0; i < contents.length; i++) { if (contents[i].classList.contains('expanded')) open.push(i); }
+            saveChatState({ toolResultsOpen: open });
+        }
+        function restoreChatState() {
             var s = loadChatState();
-            if (s.editTheme === 'light') {{
+            if (s.editTheme === 'light') {
                 document.body.classList.add('edit-diff-light');
                 var tb = document.getElementById('editToggleTheme');
                 var tl = document.getElementById('editToggleThemeLabel');
                 if (tb) tb.classList.add('is-light');
                 if (tl) tl.textContent = 'Switch to dark';
-            }}
-            if (Array.isArray(s.editBlocksOpen)) {{
+            }
+            if (Array.isArray(s.editBlocksOpen)) {
                 var blocks = document.querySelectorAll('details.tool-use-edit, details.tool-use-write');
-                s.editBlocksOpen.forEach(function(i) {{ if (blocks[i]) blocks[i].open = true; }});
-            }}
-            if (s.messagesOnly) {{ var mo = document.getElementById('messagesOnly'); if (mo) mo.checked = true; }}
-            if (s.search) {{ var si = document.getElementById('searchInput'); if (si) si.value = s.search; }}
-            if (s.navMode && s.navMode !== 'all') {{ setNavMode(s.navMode); }}
-            if (s.search || s.messagesOnly) {{ applyConversationFilter(); }}
-        }}
-
-        function getNavSelector() {{
+                s.editBlocksOpen.forEach(function(i) { if (blocks[i]) blocks[i].open = true; });
+            }
+            if (Array.isArray(s.toolResultsOpen) && s.toolResultsOpen.length) {
+                // Class writes only (no reads in between): one reflow for all.
+                var contents = document.querySelectorAll('.tool-result-msg > .msg-content');
+                var toggles = document.querySelectorAll('.tool-result-msg > .msg-header > .tool-result-toggle');
+                s.toolResultsOpen.forEach(function(i) {
+                    if (contents[i]) contents[i].classList.add('expanded');
+                    if (toggles[i]) toggles[i].classList.add('expanded');
+                });
+            }
+            if (s.messagesOnly) messagesOnlyEl.checked = true;
+            if (s.search) searchInputEl.value = s.search;
+            if (NAV_ENABLED && s.navMode && s.navMode !== 'all') { setNavMode(s.navMode); }
+            if (s.search || s.messagesOnly) { applyConversationFilter(); }
+        }
+
+        function getNavSelector() {
             const always = ', .message.nav-always';
             if (navMode === 'user') return '.message.user-msg:not(.nav-skip)' + always;
             if (navMode === 'assistant') return '.message.assistant-msg:not(.nav-skip)' + always;
             return '.message.user-msg:not(.nav-skip), .message.assistant-msg:not(.nav-skip)' + always;
-        }}
+        }
 
-        function initNavigation() {{
-            navMessages = Array.from(document.querySelectorAll(getNavSelector()));
+        // One static NodeList per mode, queried the first time that mode is
+        // used (the message set never changes after load), so switching
+        // All/User/Assistant back and forth just swaps the reference.
+        const navListCache = {};
+
+        function initNavigation() {
+            // The static NodeList is indexed in place (no Array.from copy).
+            navMessages = navListCache[navMode] || (navListCache[navMode] = document.querySelectorAll(getNavSelector()));
             currentNavIndex = -1;
             updateNavCounter();
-            setupScrollObserver();
-        }}
-
-        function updateNavCounter() {{
-            const counter = document.getElementById('navCounter');
-            if (navMessages.length === 0) {{
-                counter.textContent = '0/0';
-            }} else {{
-                counter.textContent = `${{currentNavIndex + 1}}/${{navMessages.length}}`;
-            }}
-        }}
-
-        function scrollToNavMessage(index) {{
+            if (scrollTrackingOn) setupScrollObserver();
+        }
+
+        function updateNavCounter() {
+            const next = navMessages.length === 0 ? '0/0' : (currentNavIndex + 1) + '/' + navMessages.length;
+            if (navCounterEl.textContent !== next) navCounterEl.textContent = next;
+        }
+
+        function scrollToNavMessage(index) {
             if (navMessages.length === 0) return;
             observerActive = false;
-            navMessages.forEach(msg => msg.classList.remove('nav-highlight'));
             currentNavIndex = index;
             const targetMsg = navMessages[currentNavIndex];
-            const container = document.getElementById('terminalContent');
-            const block = targetMsg.offsetHeight >= container.clientHeight ? 'start' : 'center';
-            targetMsg.scrollIntoView({{ behavior: 'auto', block }});
-            targetMsg.classList.add('nav-highlight');
+            const block = targetMsg.offsetHeight >= chatContainer.clientHeight ? 'start' : 'center';
+            const scrollBefore = chatContainer.scrollTop;
+            targetMsg.scrollIntoView({ behavior: 'auto', block });
+            setNavHighlight(targetMsg);
             updateNavCounter();
-            setTimeout(() => {{ observerActive = true; }}, 100);
-        }}
+            resumeTrackingAfterJump(scrollBefore);
+        }
+
+        // Tracking stays paused until the jump has actually landed, however
+        // long it takes: 'scrollend' where supported, else two frames (the
+        // jump is instant, so its scroll is processed by then). A jump that
+        // doesn't move the container fires no scrollend — resume at once.
+        function resumeTrackingAfterJump(scrollBefore) {
+            const resume = () => { observerActive = true; };
+            if (chatContainer.scrollTop === scrollBefore) resume();
+            else if ('onscrollend' in window) chatContainer.addEventListener('scrollend', resume, { once: true });
+            else requestAnimationFrame(() => requestAnimationFrame(resume));
+        }
 
         // The "current" position is recomputed from the actual scroll position
         // every time, so prev/next always step from what the user is looking at —
         // reliable even after a native Ctrl+F jump or manual scrolling, when
-        // currentNavIndex (kept loosely by the observer, and -1 until a message
-        // crosses its 0.5 threshold) would otherwise send the jump to an extreme.
-        function currentNavIndexFromScroll() {{
+        // currentNavIndex (kept loosely by the scroll tracking, and -1 until a
+        // message crosses the container's centre line) would otherwise send the
+        // jump to an extreme.
+        function currentNavIndexFromScroll() {
             if (navMessages.length === 0) return -1;
-            const container = document.getElementById('terminalContent');
-            const cRect = container.getBoundingClientRect();
+            const cRect = chatContainer.getBoundingClientRect();
             const cMid = cRect.top + cRect.height / 2;
             let best = 0, bestDist = Infinity;
-            for (let i = 0; i < navMessages.length; i++) {{
+            for (let i = 0; i < navMessages.length; i++) {
                 const r = navMessages[i].getBoundingClientRect();
                 const dist = Math.abs((r.top + r.height / 2) - cMid);
-                if (dist < bestDist) {{ bestDist = dist; best = i; }}
-            }}
+                if (dist < bestDist) { bestDist = dist; best = i; }
+            }
             return best;
-        }}
+        }
 
-        function goToPrev() {{
+        function goToPrev() {
             if (navMessages.length === 0) return;
+            ensureScrollTracking();
             const base = currentNavIndexFromScroll();
             scrollToNavMessage(base <= 0 ? navMessages.length - 1 : base - 1);
-        }}
+        }
 
-        function goToNext() {{
+        function goToNext() {
             if (navMessages.length === 0) return;
+            ensureScrollTracking();
             const base = currentNavIndexFromScroll();
             scrollToNavMessage(base >= navMessages.length - 1 ? 0 : base + 1);
-        }}
+        }
 
-        function setNavMode(mode) {{
+        function setNavMode(mode) {
             navMode = mode;
-            saveChatState({{ navMode: mode }});
+            saveChatState({ navMode: mode });
             document.querySelectorAll('.nav-mode-btn').forEach(btn => btn.classList.remove('active'));
             const id = 'nav' + mode.charAt(0).toUpperCase() + mode.slice(1);
             document.getElementById(id).classList.add('active');
-            if (navObserver) navObserver.disconnect();
             initNavigation();
-        }}
-
-        // Navigation buttons
-        document.getElementById('prevMsg').addEventListener('click', goToPrev);
-        document.getElementById('nextMsg').addEventListener('click', goToNext);
-        document.getElementById('navAll').addEventListener('click', () => setNavMode('all'));
-        document.getElementById('navUser').addEventListener('click', () => setNavMode('user'));
-        document.getElementById('navAssistant').addEventListener('click', () => setNavMode('assistant'));
-
-        // Keyboard shortcuts (N = next, P = previous)
-        document.addEventListener('keydown', function(e) {{
-            if (e.target.tagName === 'INPUT') return;
-            if (e.key === 'n' || e.key === 'N') goToNext();
-            if (e.key === 'p' || e.key === 'P') goToPrev();
-        }});
-
-        // Intersection Observer for scroll tracking
-        function setupScrollObserver() {{
-            const container = document.getElementById('terminalContent');
-            if (navObserver) navObserver.disconnect();
-            navObserver = new IntersectionObserver((entries) => {{
-                if (!observerActive) return;
-                entries.forEach(entry => {{
-                    if (entry.isIntersecting && entry.intersectionRatio > 0.5) {{
-                        const visibleIndex = navMessages.indexOf(entry.target);
-                        if (visibleIndex !== -1 && visibleIndex !== currentNavIndex) {{
-                            currentNavIndex = visibleIndex;
+        }
+
+        // Navigation buttons + keyboard shortcuts (N = next, P = previous).
+        // NAV_ENABLED is false for chats with at most one conversation message:
+        // generate_html then omits the nav controls and nothing is wired here.
+        if (NAV_ENABLED) {
+            document.getElementById('prevMsg').addEventListener('click', goToPrev);
+            document.getElementById('nextMsg').addEventListener('click', goToNext);
+            document.getElementById('navAll').addEventListener('click', () => setNavMode('all'));
+            document.getElementById('navUser').addEventListener('click', () => setNavMode('user'));
+            document.getElementById('navAssistant').addEventListener('click', () => setNavMode('assistant'));
+            chatContainer.addEventListener('scroll', ensureScrollTracking, { once: true, passive: true });
+
+            // One lookup rejects every other key; a held key's auto-repeat is
+            // ignored so it can't queue a jump per repeat event.
+            const NAV_KEYS = new Map([['n', goToNext], ['N', goToNext], ['p', goToPrev], ['P', goToPrev]]);
+            document.addEventListener('keydown', function(e) {
+                const action = NAV_KEYS.get(e.key);
+                if (!action || e.repeat || e.target.tagName === 'INPUT') return;
+                action();
+            });
+        }
+
+        // Scroll tracking, specialised by size: a handful of messages needs no
+        // live tracking (prev/next recompute the position from the scroll
+        // anyway); a very long chat swaps the per-message observer for a single
+        // rAF-throttled scroll listener that binary-searches the centred one.
+        const NAV_OBSERVER_MIN = 5;
+        const NAV_OBSERVER_MAX = 500;
+        let navScrollHandler = null;
+        // Tracking is set up on the first scroll of the chat or the first
+        // prev/next jump; a chat opened and closed untouched never pays for it.
+        let scrollTrackingOn = false;
+
+        function ensureScrollTracking() {
+            if (scrollTrackingOn) return;
+            scrollTrackingOn = true;
+            setupScrollObserver();
+        }
+
+        // Index of the last nav message whose top sits above the container's
+        // vertical centre. Reads O(log N) rects instead of one per message, and
+        // reads them live, so expanded blocks never leave stale offsets behind.
+        // While the filter is on, hidden messages (display:none, top 0) would
+        // break the ordering: each probe moves on to the next visible message.
+        function navIndexAtCenter(container) {
+            const cRect = container.getBoundingClientRect();
+            const cMid = cRect.top + cRect.height / 2;
+            const filtering = container.classList.contains('filtering');
+            let lo = 0, hi = navMessages.length - 1, found = 0;
+            while (lo <= hi) {
+                const mid = (lo + hi) >> 1;
+                let probe = mid;
+                if (filtering) {
+                    while (probe <= hi && navMessages[probe].classList.contains('hidden-by-search')) probe++;
+                    if (probe > hi) { hi = mid - 1; continue; }
+                }
+                if (navMessages[probe].getBoundingClientRect().top <= cMid) { found = probe; lo = probe + 1; }
+                else { hi = mid - 1; }
+            }
+            return found;
+        }
+
+        function setupScrollObserver() {
+            if (navObserver) { navObserver.disconnect(); navObserver = null; }
+            if (navScrollHandler) {
+                chatContainer.removeEventListener('scroll', navScrollHandler);
+                navScrollHandler = null;
+            }
+            if (navMessages.length < NAV_OBSERVER_MIN) return;
+            if (navMessages.length > NAV_OBSERVER_MAX) {
+                let ticking = false;
+                navScrollHandler = function() {
+                    if (ticking) return;
+                    ticking = true;
+                    requestAnimationFrame(function() {
+                        ticking = false;
+                        if (!observerActive) return;
+                        const idx = navIndexAtCenter(chatContainer);
+                        if (idx !== currentNavIndex) {
+                            currentNavIndex = idx;
                             updateNavCounter();
-                        }}
-                    }}
-                }});
-            }}, {{
-                root: container,
-                threshold: 0.5
-            }});
-            navMessages.forEach(msg => navObserver.observe(msg));
-        }}
-
-        // Initialize
-        document.addEventListener('DOMContentLoaded', function() {{
-            initNavigation();
-            restoreChatState();
-        }});
+                        }
+                    });
+                };
+                chatContainer.addEventListener('scroll', navScrollHandler, { passive: true });
+                return;
+            }
+            // Position of each observed message, for an O(1) lookup per entry;
+            // filled in the same walk that registers the messages below.
+            const navIndexOf = new WeakMap();
+            // The root is shrunk to the container's horizontal centre line, so a
+            // callback fires only when a message crosses it (also for messages
+            // over twice the viewport height, which never reached a 0.5 ratio).
+            navObserver = new IntersectionObserver((entries) => {
+                if (!observerActive) return;
+                for (let i = 0; i < entries.length; i++) {
+                    const entry = entries[i];
+                    if (!entry.isIntersecting) continue;
+                    const visibleIndex = navIndexOf.get(entry.target);
+                    if (visibleIndex !== undefined && visibleIndex !== currentNavIndex) {
+                        currentNavIndex = visibleIndex;
+                        updateNavCounter();
+                    }
+                }
+            }, {
+                root: chatContainer,
+                rootMargin: '-50% 0px -50% 0px',
+                threshold: 0
+            });
+            for (let i = 0, len = navMessages.length; i < len; i++) {
+                navIndexOf.set(navMessages[i], i);
+                navObserver.observe(navMessages[i]);
+            }
+        }
 
         // ====== SEARCH + TYPE FILTER ======
         // Combined filter: free-text match AND, optionally, "Messages only"
         // (keep just user/assistant messages carrying real text; hide tools,
         // thinking, compacts, commands, snapshots, summaries, rewinds, etc.).
-        function isConversationMsg(el) {{
+        function isConversationMsg(el) {
             return (el.classList.contains('user-msg') || el.classList.contains('assistant-msg'))
                    && !el.classList.contains('nav-skip');
-        }}
-        function applyConversationFilter() {{
-            const searchTerm = document.getElementById('searchInput').value.toLowerCase();
-            const msgsOnly = document.getElementById('messagesOnly').checked;
-            const messages = document.querySelectorAll('.message, .summary-msg, .tool-result-msg, .rewind');
+        }
+        // Search index, built on first use: the lowercased text of every
+        // filterable element joined into ONE string (separated by a control
+        // character nobody types) plus the offset where each element starts.
+        // A term is then located with indexOf over that string — one native
+        // scan — instead of walking textContent of N elements per keystroke.
+        const SEARCH_SEP = String.fromCharCode(31);
+        let searchTargets = null;
+        let searchIndex = '';
+        let searchOffsets = null;
+        function buildSearchIndex() {
+            searchTargets = document.querySelectorAll('.message, .summary-msg, .tool-result-msg, .rewind');
+            const len = searchTargets.length;
+            const texts = new Array(len);
+            searchOffsets = new Int32Array(len + 1);
+            let pos = 0;
+            for (let i = 0; i < len; i++) {
+                texts[i] = searchTargets[i].textContent.toLowerCase();
+                searchOffsets[i] = pos;
+                pos += texts[i].length + 1;
+            }
+            searchOffsets[len] = pos;
+            searchIndex = texts.join(SEARCH_SEP);
+        }
+        // Element whose slice of searchIndex contains `pos` (binary search).
+        function searchTargetAt(pos) {
+            let lo = 0, hi = searchTargets.length - 1;
+            while (lo < hi) {
+                const mid = (lo + hi + 1) >> 1;
+                if (searchOffsets[mid] <= pos) lo = mid; else hi = mid - 1;
+            }
+            return lo;
+        }
+        function applyConversationFilter() {
+            const searchTerm = searchInputEl.value.toLowerCase();
+            const msgsOnly = messagesOnlyEl.checked;
+            saveChatState({ search: searchInputEl.value, messagesOnly: msgsOnly });
+            if (!searchTerm && !msgsOnly) {
+                // Nothing to filter: dropping .filtering shows everything at once.
+                // Leftover marks are inert and get rewritten by the next pass.
+                chatContainer.classList.remove('filtering');
+                return;
+            }
+            if (!searchTargets) buildSearchIndex();
+            const messages = searchTargets;
+            const len = messages.length;
+            const hits = new Uint8Array(len);
+            if (!searchTerm) {
+                hits.fill(1);
+            } else {
+                let pos = searchIndex.indexOf(searchTerm);
+                while (pos !== -1) {
+                    const i = searchTargetAt(pos);
+                    hits[i] = 1;
+                    // Resume at the next element: one hit per element is enough.
+                    pos = i + 1 < len ? searchIndex.indexOf(searchTerm, searchOffsets[i + 1]) : -1;
+                }
+            }
             let visibleCount = 0;
-            messages.forEach(message => {{
-                let show = message.textContent.toLowerCase().includes(searchTerm);
+            for (let i = 0; i < len; i++) {
+                const message = messages[i];
+                let show = hits[i] === 1;
                 if (show && msgsOnly && !isConversationMsg(message)) show = false;
-                message.style.display = show ? '' : 'none';
+                message.classList.toggle('hidden-by-search', !show);
                 if (show) visibleCount++;
-            }});
-            console.log(`Showing ${{visibleCount}} of ${{messages.length}} messages`);
-            saveChatState({{ search: document.getElementById('searchInput').value, messagesOnly: msgsOnly }});
-        }}
-        document.getElementById('searchInput').addEventListener('input', applyConversationFilter);
-        document.getElementById('messagesOnly').addEventListener('change', applyConversationFilter);
-
-        // Toggle for collapsible tool results — the `▶` marker is already in
-        // the server-rendered HTML; here we only attach the click handler.
-        document.addEventListener('DOMContentLoaded', function() {{
-            document.querySelectorAll('.tool-result-msg').forEach(toolResult => {{
-                const header = toolResult.querySelector(':scope > .msg-header');
-                const content = toolResult.querySelector(':scope > .msg-content');
-                const toggle = header && header.querySelector(':scope > .tool-result-toggle');
-                if (!header || !content || !toggle) return;
-
-                header.addEventListener('click', function() {{
-                    const open = content.classList.toggle('expanded');
-                    toggle.classList.toggle('expanded', open);
-                }});
-            }});
-        }});
+            }
+            chatContainer.classList.add('filtering');
+            console.log(`Showing ${visibleCount} of ${len} messages`);
+        }
+        // Typing is coalesced into at most one filter pass per frame; on very
+        // large chats a short debounce also waits for a pause in typing, so a
+        // fast typist doesn't restyle thousands of elements per keystroke.
+        const FILTER_DEBOUNCE_MIN = 5000;
+        const FILTER_DEBOUNCE_MS = 60;
+        let filterFrame = 0;
+        let filterTimer = 0;
+        function filterOnNextFrame() {
+            if (filterFrame) return;
+            filterFrame = requestAnimationFrame(function() {
+                filterFrame = 0;
+                applyConversationFilter();
+            });
+        }
+        function scheduleConversationFilter() {
+            if (searchTargets && searchTargets.length > FILTER_DEBOUNCE_MIN) {
+                clearTimeout(filterTimer);
+                filterTimer = setTimeout(filterOnNextFrame, FILTER_DEBOUNCE_MS);
+            } else {
+                filterOnNextFrame();
+            }
+        }
+        searchInputEl.addEventListener('input', scheduleConversationFilter);
+        messagesOnlyEl.addEventListener('change', applyConversationFilter);
+
+        // Toggle for collapsible tool results and compact blocks — the
+        // structure and the `▶` marker are server-rendered; one delegated
+        // listener on the chat container serves every header (nothing to walk
+        // or wire at load, no inline handler per block).
+        chatContainer.addEventListener('click', function(e) {
+            const copyBtn = e.target.closest('.copy-btn');
+            if (copyBtn) { copyMessage(copyBtn); return; }
+            const compactHeader = e.target.closest('.compact-header');
+            if (compactHeader) {
+                const body = compactHeader.parentElement.querySelector(':scope > .compact-content');
+                const marker = compactHeader.querySelector(':scope > .compact-toggle');
+                if (!body) return;
+                const expanded = body.classList.toggle('expanded');
+                if (marker) marker.textContent = expanded ? '▼' : '▶';
+                return;
+            }
+            const header = e.target.closest('.tool-result-msg > .msg-header');
+            if (!header) return;
+            const content = header.parentElement.querySelector(':scope > .msg-content');
+            const toggle = header.querySelector(':scope > .tool-result-toggle');
+            if (!content || !toggle) return;
+            const open = content.classList.toggle('expanded');
+            toggle.classList.toggle('expanded', open);
+            saveToolResultsState();
+        });
 
         // ====== Chat UUID: copy to clipboard ======
-        function copyChatUuid(btn) {{
+        function copyChatUuid(btn) {
             const uuid = btn.parentNode.querySelector('.chat-uuid').textContent;
-            navigator.clipboard.writeText(uuid).then(function() {{
+            navigator.clipboard.writeText(uuid).then(function() {
                 const orig = btn.innerHTML;
                 btn.innerHTML = '✓';
                 btn.classList.add('copied');
-                setTimeout(function() {{
+                setTimeout(function() {
                     btn.innerHTML = orig;
                     btn.classList.remove('copied');
-                }}, 1200);
-            }});
-        }}
+                }, 1200);
+            });
+        }
 
         // ====== Edit blocks: expand / collapse all ======
-        (function() {{
+        (function() {
             const btn = document.getElementById('editToggleCollapse');
             if (!btn) return;
             const icon = document.getElementById('editToggleIcon');
             const getBlocks = () => document.querySelectorAll('details.tool-use-edit, details.tool-use-write');
-            const refresh = () => {{
-                const blocks = getBlocks();
-                const anyOpen = Array.from(blocks).some(d => d.open);
+            const isAnyOpen = (blocks) => {
+                for (let i = 0, len = blocks.length; i < len; i++) { if (blocks[i].open) return true; }
+                return false;
+            };
+            const refresh = () => {
+                const anyOpen = isAnyOpen(getBlocks());
                 icon.innerHTML = anyOpen ? '&#9660;' : '&#9654;';
-            }};
-            btn.addEventListener('click', function() {{
+            };
+            btn.addEventListener('click', function() {
                 const blocks = getBlocks();
                 if (!blocks.length) return;
-                const anyOpen = Array.from(blocks).some(d => d.open);
-                blocks.forEach(d => {{ d.open = !anyOpen; }});
+                const anyOpen = isAnyOpen(blocks);
+                for (let i = 0, len = blocks.length; i < len; i++) blocks[i].open = !anyOpen;
                 refresh();
-            }});
-            document.addEventListener('toggle', function(e) {{
-                if (e.target && e.target.classList && (e.target.classList.contains('tool-use-edit') || e.target.classList.contains('tool-use-write'))) {{
+            });
+            document.addEventListener('toggle', function(e) {
+                if (e.target && e.target.classList && (e.target.classList.contains('tool-use-edit') || e.target.classList.contains('tool-use-write'))) {
                     refresh();
                     saveEditBlocksState();
-                }}
-            }}, true);
+                }
+            }, true);
             refresh();
-        }})();
+        })();
 
         // ====== Edit diff: theme toggle (dark default / light) ======
-        (function() {{
+        (function() {
             const btn = document.getElementById('editToggleTheme');
             if (!btn) return;
             const label = document.getElementById('editToggleThemeLabel');
-            btn.addEventListener('click', function() {{
+            btn.addEventListener('click', function() {
                 const isLight = document.body.classList.toggle('edit-diff-light');
                 btn.classList.toggle('is-light', isLight);
                 label.textContent = isLight ? 'Switch to dark' : 'Switch to light';
-                saveChatState({{ editTheme: isLight ? 'light' : 'dark' }});
-            }});
-        }})();
+                saveChatState({ editTheme: isLight ? 'light' : 'dark' });
+            });
+        })();
 
         // Restore saved scroll position after layout settles (default: top);
-        // persist scroll as the reader moves (throttled).
-        window.addEventListener('load', function() {{
-            const content = document.getElementById('terminalContent');
+        // persist scroll as the reader moves (throttled). This stays on 'load'
+        // rather than DOMContentLoaded: the saved offset is only meaningful once
+        // the final layout is in place.
+        window.addEventListener('load', function() {
             var st = loadChatState();
-            content.scrollTop = (typeof st.scroll === 'number') ? st.scroll : 0;
+            chatContainer.scrollTop = (typeof st.scroll === 'number') ? st.scroll : 0;
             var saveTimer = null;
-            content.addEventListener('scroll', function() {{
+            chatContainer.addEventListener('scroll', function() {
                 if (saveTimer) clearTimeout(saveTimer);
-                saveTimer = setTimeout(function() {{ saveChatState({{ scroll: content.scrollTop }}); }}, 200);
-            }});
+                saveTimer = setTimeout(function() { saveChatState({ scroll: chatContainer.scrollTop }); }, 200);
+            }, { passive: true });
             // State restored — drop the loading overlay (one frame later so the
             // restored scroll position is already painted underneath).
-            requestAnimationFrame(function() {{
+            requestAnimationFrame(function() {
                 var ld = document.getElementById('chatLoading');
-                if (ld) {{ ld.classList.add('hidden'); setTimeout(function() {{ ld.remove(); }}, 300); }}
-            }});
-        }});
+                if (ld) { ld.classList.add('hidden'); setTimeout(function() { ld.remove(); }, 300); }
+            });
+            // Build the search index while the page is idle, so the first
+            // keystroke filters straight away instead of paying for the build.
+            var warm = function() { if (!searchTargets) buildSearchIndex(); };
+            if (window.requestIdleCallback) requestIdleCallback(warm, { timeout: 2000 });
+            else setTimeout(warm, 200);
+        });
 
         // Show a brief, non-blocking toast — visible fallback so a navigation
         // button never feels dead when its target can't be located.
-        function showNavToast(message) {{
+        function showNavToast(message) {
             var t = document.createElement('div');
             t.className = 'nav-toast';
             t.textContent = message;
             document.body.appendChild(t);
-            requestAnimationFrame(function() {{ t.classList.add('show'); }});
-            setTimeout(function() {{
+            requestAnimationFrame(function() { t.classList.add('show'); });
+            setTimeout(function() {
                 t.classList.remove('show');
-                setTimeout(function() {{ t.remove(); }}, 300);
-            }}, 2200);
-        }}
+                setTimeout(function() { t.remove(); }, 300);
+            }, 2200);
+        }
         // Scroll to a message by uuid and highlight it (used by the rewind button).
-        function gotoMessage(uuid) {{
+        function gotoMessage(uuid) {
             var target = document.querySelector('[data-msg-uuid="' + uuid + '"]');
-            if (!target) {{ showNavToast("Couldn't locate that point in the chat"); return; }}
+            if (!target) { showNavToast("Couldn't locate that point in the chat"); return; }
             // If an active filter (search / "Messages only") hides the target,
             // scrollIntoView would do nothing — clear the filter first so the
             // destination and its surrounding context become visible.
-            if (target.offsetParent === null) {{
-                var si = document.getElementById('searchInput');
-                var mo = document.getElementById('messagesOnly');
-                if (si) si.value = '';
-                if (mo) mo.checked = false;
+            if (target.offsetParent === null) {
+                searchInputEl.value = '';
+                messagesOnlyEl.checked = false;
                 if (typeof applyConversationFilter === 'function') applyConversationFilter();
                 showNavToast('Filter cleared to show the destination');
-            }}
-            document.querySelectorAll('.nav-highlight').forEach(function(m) {{ m.classList.remove('nav-highlight'); }});
-            var container = document.getElementById('terminalContent');
-            var block = (container && target.offsetHeight >= container.clientHeight) ? 'start' : 'center';
-            target.scrollIntoView({{ behavior: 'smooth', block: block }});
-            target.classList.add('nav-highlight');
-        }}
+            }
+            var block = (target.offsetHeight >= chatContainer.clientHeight) ? 'start' : 'center';
+            target.scrollIntoView({ behavior: 'auto', block: block });
+            setNavHighlight(target);
+        }
         // Open an embedded image (base64) in a modal/lightbox. The image is
         // decoded to a Blob URL on click, shown in an overlay, and the URL is
         // revoked on close to free memory. Focus moves into the dialog and
         // returns to the trigger on close (accessible modal).
         var lastFocusedBeforeModal = null;
-        function openImage(el) {{
-            try {{
+        function openImage(el) {
+            try {
                 var b64 = el.getAttribute('data-img');
                 var media = el.getAttribute('data-media') || 'image/png';
                 var bin = atob(b64);
                 var bytes = new Uint8Array(bin.length);
-                for (var i = 0; i < bin.length; i++) {{ bytes[i] = bin.charCodeAt(i); }}
-                var url = URL.createObjectURL(new Blob([bytes], {{ type: media }}));
+                for (var i = 0; i < bin.length; i++) { bytes[i] = bin.charCodeAt(i); }
+                var url = URL.createObjectURL(new Blob([bytes], { type: media }));
                 var img = document.getElementById('imgModalImg');
                 if (img.dataset.url) URL.revokeObjectURL(img.dataset.url);
                 img.src = url;
@@ -3522,50 +3629,506 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                 document.getElementById('imgModal').classList.add('open');
                 var closeBtn = document.querySelector('.img-modal-close');
                 if (closeBtn) closeBtn.focus();
-            }} catch (e) {{
+            } catch (e) {
                 alert('Could not open image: ' + e.message);
-            }}
-        }}
-        function closeImageModal() {{
+            }
+        }
+        function closeImageModal() {
             var modal = document.getElementById('imgModal');
             var img = document.getElementById('imgModalImg');
             modal.classList.remove('open');
-            if (img.dataset.url) {{ URL.revokeObjectURL(img.dataset.url); img.removeAttribute('data-url'); }}
+            if (img.dataset.url) { URL.revokeObjectURL(img.dataset.url); img.removeAttribute('data-url'); }
             img.removeAttribute('src');
-            if (lastFocusedBeforeModal && lastFocusedBeforeModal.focus) {{ lastFocusedBeforeModal.focus(); }}
+            if (lastFocusedBeforeModal && lastFocusedBeforeModal.focus) { lastFocusedBeforeModal.focus(); }
             lastFocusedBeforeModal = null;
-        }}
-        document.addEventListener('keydown', function(e) {{
+        }
+        document.addEventListener('keydown', function(e) {
             var modal = document.getElementById('imgModal');
             if (!modal || !modal.classList.contains('open')) return;
-            if (e.key === 'Escape') {{ closeImageModal(); }}
+            if (e.key === 'Escape') { closeImageModal(); }
             // Only the close button is focusable: keep Tab inside the dialog.
-            else if (e.key === 'Tab') {{ e.preventDefault(); var b = document.querySelector('.img-modal-close'); if (b) b.focus(); }}
-        }});
-        // Copy button on every message (added client-side to avoid touching each renderer)
-        document.addEventListener('DOMContentLoaded', function() {{
-            var COPY = '<svg viewBox="0 0 16 16" fill="none" stroke="currentColor" stroke-width="1.5"><rect x="5.5" y="5.5" width="8" height="8" rx="1.3"/><path d="M3 10.5V3.2A1.2 1.2 0 0 1 4.2 2H11"/></svg>';
-            var CHECK = '<svg viewBox="0 0 16 16" fill="none" stroke="currentColor" stroke-width="2"><path d="M3 8.5l3.3 3.3L13 4.5"/></svg>';
-            document.querySelectorAll('.message').forEach(function(msg) {{
-                var content = msg.querySelector('.msg-content');
-                if (!content) return;
+            else if (e.key === 'Tab') { e.preventDefault(); var b = document.querySelector('.img-modal-close'); if (b) b.focus(); }
+        });
+        // Copy button on every message (added client-side to avoid touching each
+        // renderer). Clicks reach copyMessage through the chat container's
+        // delegated listener, so no per-button handler is attached.
+        var COPY_ICON = '<svg viewBox="0 0 16 16" fill="none" stroke="currentColor" stroke-width="1.5"><rect x="5.5" y="5.5" width="8" height="8" rx="1.3"/><path d="M3 10.5V3.2A1.2 1.2 0 0 1 4.2 2H11"/></svg>';
+        var CHECK_ICON = '<svg viewBox="0 0 16 16" fill="none" stroke="currentColor" stroke-width="2"><path d="M3 8.5l3.3 3.3L13 4.5"/></svg>';
+        function addCopyButtons() {
+            var msgs = document.querySelectorAll('.message');
+            for (var i = 0; i < msgs.length; i++) {
+                if (!msgs[i].querySelector('.msg-content')) continue;
                 var btn = document.createElement('button');
                 btn.type = 'button';
                 btn.className = 'copy-btn';
                 btn.title = 'Copy message';
-                btn.innerHTML = COPY;
-                btn.addEventListener('click', function(e) {{
-                    e.stopPropagation();
-                    navigator.clipboard.writeText(content.innerText).then(function() {{
-                        btn.innerHTML = CHECK;
-                        btn.classList.add('copied');
-                        setTimeout(function() {{ btn.innerHTML = COPY; btn.classList.remove('copied'); }}, 1200);
-                    }});
-                }});
-                msg.appendChild(btn);
-            }});
-        }});
-    </script>
+                btn.innerHTML = COPY_ICON;
+                msgs[i].appendChild(btn);
+            }
+        }
+        function copyMessage(btn) {
+            var content = btn.parentNode.querySelector('.msg-content');
+            if (!content) return;
+            navigator.clipboard.writeText(content.innerText).then(function() {
+                btn.innerHTML = CHECK_ICON;
+                btn.classList.add('copied');
+                setTimeout(function() { btn.innerHTML = COPY_ICON; btn.classList.remove('copied'); }, 1200);
+            });
+        }
+
+        // Single page initializer (scroll restore waits for 'load', above).
+        document.addEventListener('DOMContentLoaded', function() {
+            if (NAV_ENABLED) initNavigation();
+            addCopyButtons();
+            restoreChatState();
+        });
+"""
+
+
+# Chats with at least this many entries to render are split across a process
+# pool (one worker per core); smaller ones render serially. Measured on the
+# demo chat's mix: ~12 us to render an entry serially, ~1.2 us to ship it to a
+# worker and back, and a pool start of ~10 ms (fork) to ~130 ms per worker
+# (spawn: Windows, macOS). With 4 workers that breaks even at roughly 15-20k
+# entries; below this threshold the pool only made rendering slower.
+PARALLEL_RENDER_MIN = 25_000
+_RENDER_CHUNK = 512
+
+# One pool serves every large chat of a run (the manager renders a batch of
+# chats in one process), so workers start once; see shutdown_render_pool().
+_RENDER_POOL = None
+
+# Worker side: the pickled per-chat state last applied, and its rewind map.
+_WORKER_STATE = None
+_WORKER_REWIND_DEST = None
+
+
+# Pseudo-entries built by the pre-processing passes, by their marker key.
+_PSEUDO_ENTRY_RENDERERS = (
+    ('_compact_group', render_compact_block),
+    ('_btw_inline_history', render_btw_history_message),
+)
+
+
+def _render_entry(msg, index: int, rewind_dest: dict) -> str:
+    """Render one processed entry (message, compact group, /btw or queued)."""
+    if type(msg) is dict:
+        for marker, render in _PSEUDO_ENTRY_RENDERERS:
+            if msg.get(marker):
+                return render(msg)
+    if is_queued_user_message(msg):
+        return render_queued_message(msg, index, rewind_dest)
+    return format_message_html(msg, index, rewind_dest)
+
+
+def _render_chunk(state: bytes, entries: list) -> list:
+    """Worker side of _render_entries: render a slice of (index, entry) pairs.
+
+    `state` is the pickled per-chat state generate_html keeps in globals; a
+    worker applies it only when it differs from the chat it rendered last.
+    """
+    global TIME_FORMAT, _TASK_AGENT_LABELS, _WORKER_STATE, _WORKER_REWIND_DEST
+    if state != _WORKER_STATE:
+        time_format, task_agent_labels, agent_html_map, rewind_dest = pickle.loads(state)
+        TIME_FORMAT = time_format
+        _TASK_AGENT_LABELS = task_agent_labels
+        AGENT_HTML_MAP.clear()
+        AGENT_HTML_MAP.update(agent_html_map)
+        _WORKER_STATE, _WORKER_REWIND_DEST = state, rewind_dest
+        _escape_tool_result_text.cache_clear()
+    return [_render_entry(msg, i, _WORKER_REWIND_DEST) for i, msg in entries]
+
+
+def shutdown_render_pool():
+    """Stop the render workers, if any were started (end of a batch run)."""
+    global _RENDER_POOL
+    if _RENDER_POOL is not None:
+        _RENDER_POOL.shutdown(cancel_futures=True)
+        _RENDER_POOL = None
+
+
+def _render_entries(entries: list, rewind_dest: dict):
+    """Yield the HTML of each (index, entry) pair, in order.
+
+    Rendering is pure per entry, so long chats are rendered in chunks on a
+    process pool (results still arrive in order for streaming). Only about two
+    chunks per worker are in flight at a time: the next chunk is submitted as
+    the oldest one is handed out, so finished chunks never pile up ahead of
+    the writer. If a pool cannot be used here, rendering continues serially
+    from the first entry not yet produced.
+    """
+    global _RENDER_POOL
+    done = 0
+    workers = os.cpu_count() or 1
+    if len(entries) >= PARALLEL_RENDER_MIN and workers > 1:
+        state = pickle.dumps((TIME_FORMAT, _TASK_AGENT_LABELS, dict(AGENT_HTML_MAP), rewind_dest))
+        starts = iter(range(0, len(entries), _RENDER_CHUNK))
+        pending = deque()
+        try:
+            if _RENDER_POOL is None:
+                _RENDER_POOL = ProcessPoolExecutor()
+            for k in starts:
+                pending.append(_RENDER_POOL.submit(_render_chunk, state, entries[k:k + _RENDER_CHUNK]))
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                rendered = pending.popleft().result()
+                k = next(starts, None)
+                if k is not None:
+                    pending.append(_RENDER_POOL.submit(_render_chunk, state, entries[k:k + _RENDER_CHUNK]))
+                yield from rendered
+                done += len(rendered)
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # no usable process pool (sandbox, missing sem_open, ...)
+            shutdown_render_pool()
+        finally:
+            # The pool outlives this chat: drop whatever is still queued when
+            # the caller stops early (a failed write).
+            for future in pending:
+                future.cancel()
+    for i, msg in entries[done:]:
+        yield _render_entry(msg, i, rewind_dest)
+
+
+def generate_html(messages: List[Dict], output_file: str, dashboard_url: str = None, chat_title: str = "", chat_uuid: str = "", history_entries=None, time_format: str = "12h", agent_of: str = None, gzip_copy: bool = False):
+    """Generate the complete HTML document in terminal style.
+
+    `history_entries`, when provided, is a list of /btw entries from
+    ~/.claude/history.jsonl. The ones matching `chat_uuid` are merged into the
+    flow as pseudo-messages styled in Claude cream so users can see /btw
+    queries that Claude Code doesn't persist as full Q+A any more.
+
+    `time_format` controls the time portion of timestamps: "12h" (AM/PM,
+    default) or "24h".
+
+    `gzip_copy` also writes `<output_file>.gz` when the rendered messages reach
+    GZIP_MIN_BYTES — for serving big chats over HTTP with Content-Encoding:
+    gzip. The plain .html is always written (browsers can't open a .gz from
+    disk, and the dashboard links to the .html). An existing .gz is removed
+    whenever no copy is written, so it never goes stale next to the .html.
+    """
+    try:
+        _generate_html(messages, output_file, dashboard_url, chat_title, chat_uuid,
+                       history_entries, time_format, agent_of, gzip_copy)
+    finally:
+        # Per-chat module state must not outlive the call (the manager renders
+        # a whole batch in one process), whatever step fails. That includes
+        # the escaped tool-result bodies, the largest strings of a chat.
+        _TOOL_RESULT_FLAGS.clear()
+        _escape_tool_result_text.cache_clear()
+
+
+def _generate_html(messages: List[Dict], output_file: str, dashboard_url: str = None, chat_title: str = "", chat_uuid: str = "", history_entries=None, time_format: str = "12h", agent_of: str = None, gzip_copy: bool = False):
+    """Body of generate_html, which owns the cleanup of per-chat state."""
+    global TIME_FORMAT, _TASK_AGENT_LABELS
+    TIME_FORMAT = time_format if time_format in ("12h", "24h") else "12h"
+    _TASK_AGENT_LABELS = _chat_agent_labels(messages)
+
+    # Count statistics (distinguishing tool_results)
+    total_lines = len(messages)
+    real_user_msgs = 0
+    tool_result_msgs = 0
+    assistant_msgs = 0
+    summaries = 0
+
+    # One pass; the inner message dict and its role are looked up once each.
+    for m in messages:
+        m_type = m.get('type')
+        if m_type == 'summary':
+            summaries += 1
+            continue
+        if m_type == 'attachment' and is_queued_user_message(m):
+            real_user_msgs += 1
+            continue
+        md = m.get('message') or _EMPTY
+        role = md.get('role')
+        if role == 'user':
+            content = md.get('content', [])
+            is_tool_result = is_tool_result_message(content)
+            _TOOL_RESULT_FLAGS[id(m)] = (m, is_tool_result)
+            if is_tool_result:
+                tool_result_msgs += 1
+            elif is_compact_summary(_get_text_from_content(content)):
+                summaries += 1
+            else:
+                real_user_msgs += 1
+        elif role == 'assistant':
+            assistant_msgs += 1
+
+    # Pre-process: group compact-related messages, then inject /btw entries
+    # from history.jsonl (those matching this session) at their timestamps.
+    processed_messages = group_compact_messages(messages)
+
+    btw_for_session = []
+    if history_entries and chat_uuid:
+        btw_for_session = [e for e in history_entries if e.get('sessionId') == chat_uuid]
+    if btw_for_session:
+        processed_messages = merge_btw_history_into_messages(processed_messages, btw_for_session)
+
+    btw_count = len(btw_for_session)  # each entry is merged in exactly once
+
+    # F3: detect conversation rewinds. A real rewind = an abandoned prompt with
+    # human text whose parent has a LATER sibling that is also human text (the
+    # retry); forks made only of tool_use/tool_result are ignored. The label is
+    # the nearest ancestor with human text; N is how many human messages sit
+    # between that destination and the rewind marker ON SCREEN (the snapshot's
+    # position) — i.e. how far up the Go button scrolls. Measuring the abandoned
+    # branch instead gave huge, confusing counts when the destination is right
+    # above (e.g. two retries of the same prompt showing "24 messages back").
+    msg_nodes = {}
+    siblings = {}
+    for idx, m in enumerate(messages):
+        if isinstance(m, dict) and m.get('uuid') and m.get('type') in ('user', 'assistant', 'system'):
+            u = m['uuid']
+            msg_nodes[u] = {'parent': m.get('parentUuid'), 'idx': idx, 'line': _first_human_line(m)}
+            siblings.setdefault(m.get('parentUuid'), []).append((idx, u))
+
+    def _rewind_destination(prompt_uuid):
+        node = msg_nodes.get(prompt_uuid)
+        if not node or not node['line']:
+            return None  # the abandoned prompt must itself be human text
+        later = [si for si, su in siblings.get(node['parent'], [])
+                 if su != prompt_uuid and si > node['idx'] and msg_nodes[su]['line']]
+        if not later:
+            return None  # no human retry after it -> active branch, not a rewind
+        cur, seen = node['parent'], set()
+        while cur and cur in msg_nodes and cur not in seen:
+            seen.add(cur)
+            if msg_nodes[cur]['line']:
+                return cur
+            cur = msg_nodes[cur]['parent']
+        return None
+
+    rewind_dest = {}
+    for snap_idx, m in enumerate(messages):
+        if isinstance(m, dict) and m.get('type') == 'file-history-snapshot':
+            mid = m.get('messageId', '')
+            if mid and mid not in rewind_dest:
+                dest = _rewind_destination(mid)
+                if dest:
+                    dest_idx = msg_nodes[dest]['idx']
+                    n_back = sum(1 for nd in msg_nodes.values()
+                                 if dest_idx < nd['idx'] < snap_idx and nd['line'])
+                    rewind_dest[mid] = (dest, msg_nodes[dest]['line'], n_back)
+
+    # Extract chat date and time (converted to local timezone)
+    chat_timestamp = get_chat_timestamp(messages)
+    if chat_timestamp:
+        try:
+            dt = _parse_local_datetime(chat_timestamp)
+            # Date format follows the chosen time format: 24h -> DD/MM/YYYY
+            # (European), 12h -> MM/DD/YYYY (US, consistent with AM/PM).
+            date_fmt = '%m/%d/%Y' if TIME_FORMAT == '12h' else '%d/%m/%Y'
+            chat_date = dt.strftime(date_fmt)
+            chat_time = dt.strftime(_time_pattern())
+        except (ValueError, TypeError, AttributeError):  # as in generate_output_filename
+            chat_date = "N/A"
+            chat_time = "N/A"
+    else:
+        chat_date = "N/A"
+        chat_time = "N/A"
+
+    # Build header action buttons
+    header_actions_parts = []
+    if dashboard_url:
+        header_actions_parts.append(
+            f'<a href="{escape(dashboard_url)}" class="header-btn" title="Back to Dashboard">&#9664; Dashboard</a>'
+        )
+    header_actions_parts.append(
+        '<a href="https://github.com/oskar-gm/code-chat-viewer/issues" target="_blank" rel="noopener" class="header-btn feedback" title="Report an issue or send feedback on GitHub">Feedback</a>'
+    )
+    header_actions_parts.append(
+        '<a href="https://github.com/oskar-gm/code-chat-viewer/releases/latest" target="_blank" rel="noopener" class="header-btn release" title="Latest release — check for updates">Latest release</a>'
+    )
+    header_actions_html = '\n                '.join(header_actions_parts)
+
+    # JS string literal for the per-chat sessionStorage key (safely quoted).
+    chat_state_key = json.dumps(chat_uuid or "")
+
+    # Prev/next navigation only makes sense with 2+ conversation messages; for
+    # smaller chats the controls are left out and the script skips their setup.
+    nav_enabled = real_user_msgs + assistant_msgs > 1
+
+    # Complete HTML document in terminal style, streamed to disk as head, one
+    # write per rendered message, then tail: peak memory stays at one message
+    # (a small window of chunks when rendering in parallel, see _render_entries;
+    # plus the 1 MB write buffer) instead of the whole page. It is written to a
+    # temporary file and moved into place, so a failed render never leaves a
+    # truncated chat behind.
+    html_head = f'''<!DOCTYPE html>
+<!--
+=============================================================================
+Code Chat Viewer v{APP_VERSION} - Professional Chat Log HTML Exporter
+Generated HTML Visualization
+=============================================================================
+
+Created with: Code Chat Viewer
+Repository: https://github.com/oskar-gm/code-chat-viewer
+Website: https://nucleoia.es
+License: MIT License
+
+This HTML file was generated by Code Chat Viewer, an open-source tool
+for converting Claude Code, VS Code, and Visual Studio Code chat logs (JSONL)
+into readable, professional HTML visualizations with terminal-style aesthetics.
+
+Learn more: https://github.com/oskar-gm/code-chat-viewer
+Developer: https://nucleoia.es
+
+Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+=============================================================================
+-->
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+
+    <!-- SEO Meta Tags -->
+    <meta name="description" content="Claude Code conversation visualization - Convert JSONL chat logs to professional HTML. Export AI coding conversations with terminal-style UI, collapsible tool results, conversation filter, and interactive dashboard. Works with Claude Code, VS Code, and AI coding assistants.">
+    <meta name="keywords" content="Claude Code, Claude Code history, chat history, conversation history, claude code chat history, chat viewer, conversation export, JSONL to HTML, AI chat visualization, Claude Code logs, export claude code chats, chat log viewer, VS Code chat export, developer tools, Claude AI, AI conversation viewer, terminal UI, chat dashboard">
+
+    <meta name="generator" content="Code Chat Viewer v{APP_VERSION} - https://github.com/oskar-gm/code-chat-viewer">
+    <meta name="robots" content="index, follow">
+    <meta name="language" content="English, Spanish">
+
+    <!-- Open Graph / Social Media Meta Tags -->
+    <meta property="og:type" content="article">
+    <meta property="og:title" content="Claude Code Conversation - Professional Terminal Visualization">
+    <meta property="og:description" content="Professional visualization of Claude Code chat logs. Convert JSONL to HTML with terminal-style aesthetics. Created with Code Chat Viewer.">
+    <meta property="og:url" content="https://github.com/oskar-gm/code-chat-viewer">
+    <meta property="og:site_name" content="Code Chat Viewer">
+    <meta property="og:locale" content="en_US">
+    <meta property="og:locale:alternate" content="es_ES">
+
+    <!-- Twitter Card -->
+    <meta name="twitter:card" content="summary">
+    <meta name="twitter:title" content="Claude Code Conversation Visualization">
+    <meta name="twitter:description" content="Professional HTML export from Claude Code JSONL chat logs">
+
+    <!-- Author & Publisher -->
+    <link rel="author" href="https://nucleoia.es">
+    <link rel="canonical" href="https://github.com/oskar-gm/code-chat-viewer">
+    <meta name="publisher" content="nucleoia.es">
+
+    <link rel="icon" type="image/png" href="data:image/png;base64,'''
+    html_head_title = f'''">
+    <title>{escape(chat_title) + ' - ' if chat_title else ''}Code Chat Viewer</title>
+    <style>
+'''
+    # The stylesheet and the two icons are written on their own, between the
+    # head fragments, rather than being copied into one big formatted string.
+    html_head_rest = f'''    </style>
+</head>
+<body>
+    <div id="chatLoading" class="chat-loading"><div class="chat-loading-spin"></div><div class="chat-loading-msg">Loading your chat… hang tight!</div></div>
+    <div class="container">
+        <div class="terminal-header">
+            <div class="terminal-title">
+                <img src="data:image/png;base64,'''
+    html_head_header = f'''" alt="" style="height:16px;width:16px;vertical-align:middle;margin-right:6px;" onerror="this.style.display='none'">
+                <span>Code Chat Viewer</span>
+                <span class="app-version" style="color:#777;font-size:11px;margin-left:8px;">v{APP_VERSION}</span>
+                {'<span class="chat-name-sep">|</span><span class="chat-name">' + escape(chat_title) + '</span>' if chat_title else ''}
+                {('<span class="agent-chip" title="Agent chat &mdash; a sub-chat launched by the Task tool, invoked by session ' + escape(agent_of) + '">AGENT CHAT</span>') if agent_of else ''}
+            </div>
+            <div class="header-actions">
+                {('<span class="chat-uuid-wrap" title="Chat UUID"><span class="chat-uuid">' + escape(chat_uuid) + '</span><button class="chat-uuid-copy" onclick="copyChatUuid(this)" title="Copy UUID"><svg xmlns=\"http://www.w3.org/2000/svg\" width=\"12\" height=\"12\" viewBox=\"0 0 24 24\" fill=\"none\" stroke=\"currentColor\" stroke-width=\"2\" stroke-linecap=\"round\" stroke-linejoin=\"round\"><rect x=\"9\" y=\"9\" width=\"13\" height=\"13\" rx=\"2\" ry=\"2\"/><path d=\"M5 15H4a2 2 0 0 1-2-2V4a2 2 0 0 1 2-2h9a2 2 0 0 1 2 2v1\"/></svg></button></span>') if chat_uuid else ''}
+                {header_actions_html}
+            </div>
+            <div class="terminal-controls">
+                <span class="terminal-btn btn-close"></span>
+                <span class="terminal-btn btn-minimize"></span>
+                <span class="terminal-btn btn-maximize"></span>
+            </div>
+        </div>
+
+        <div class="stats-bar">
+            <div>
+                Total: {total_lines} lines |
+                User: {real_user_msgs} |
+                Assistant: {assistant_msgs} |
+                Tool Results: {tool_result_msgs} |
+                Summaries: {summaries} |
+                Rewinds: {len(rewind_dest)} |
+                BTW: {btw_count}
+            </div>
+            <div>
+                Created: {chat_date} {chat_time}
+            </div>
+        </div>
+
+        <div class="search-bar">
+            <input type="text" class="search-input" id="searchInput" placeholder="Filter conversation..." autocomplete="off" autocorrect="off" autocapitalize="off" spellcheck="false">
+            <label class="filter-toggle" title="Show only user and assistant messages (hide tools, thinking, compacts, snapshots...)">
+                <input type="checkbox" id="messagesOnly">
+                <span>Messages only</span>
+            </label>
+            <span class="toolbar-divider"></span>
+            <div class="edit-ctrl-group">
+                <button class="edit-ctrl-btn" id="editToggleCollapse" title="Expand / collapse all Edit and Write blocks">
+                    <span class="edit-ctrl-icon" id="editToggleIcon">&#9654;</span>
+                    <span>Edits/Writes</span>
+                </button>
+                <button class="edit-ctrl-btn edit-ctrl-btn-theme" id="editToggleTheme" title="Switch the Edit/Write diff theme between dark and light">
+                    <span id="editToggleThemeLabel">Switch to light</span>
+                </button>
+            </div>
+            {_NAV_CONTROLS_HTML if nav_enabled else ''}
+        </div>
+
+        <div class="terminal-content" id="terminalContent">
+'''
+
+    # F3: render only snapshots that are real rewinds (skip guards/duplicates).
+    # Decided up front, in order, so the rendering itself is independent per entry.
+    to_render = []
+    shown_rewind_mids = set()
+    for i, msg in enumerate(processed_messages):
+        if isinstance(msg, dict) and msg.get('type') == 'file-history-snapshot':
+            mid = msg.get('messageId', '')
+            if mid not in rewind_dest or mid in shown_rewind_mids:
+                continue
+            shown_rewind_mids.add(mid)
+        to_render.append((i, msg))
+
+    tmp_file = output_file + '.tmp'
+    # Binary stream: each fragment is encoded in one call and handed to the
+    # buffer as is, with no text layer re-chunking it on the way. Chat text
+    # may carry a lone surrogate (json.loads accepts one, e.g. output cut
+    # mid-emoji); it is written as '?' instead of failing the whole page.
+    out = open(tmp_file, 'wb', buffering=1 << 20)
+    try:
+        out.write(html_head.encode('utf-8', 'replace'))
+        out.write(_ICON_FAVICON_BASE64_BYTES)
+        out.write(html_head_title.encode('utf-8', 'replace'))
+        out.write(_CHAT_CSS.encode('utf-8'))
+        out.write(html_head_rest.encode('utf-8', 'replace'))
+        out.write(_ICON_BASE64_BYTES)
+        out.write(html_head_header.encode('utf-8', 'replace'))
+        # Generate HTML for all messages
+        element_count = 0
+        messages_bytes = 0
+        for msg_html in _render_entries(to_render, rewind_dest):
+            if msg_html:
+                data = msg_html.encode('utf-8', 'replace')
+                out.write(data)
+                out.write(b'\n')
+                element_count += 1
+                messages_bytes += len(data)
+
+        html_tail = f'''        </div>
+
+        <div class="footer">
+            <a href="https://github.com/oskar-gm/code-chat-viewer" target="_blank" style="color: #666; text-decoration: none;">Code Chat Viewer</a> |
+            Processed {element_count} elements from {total_lines} total lines |
+            <a href="https://github.com/oskar-gm/code-chat-viewer/issues" target="_blank" rel="noopener" style="color: #666; text-decoration: none;">Feedback</a>
+        </div>
+    </div>
+
+    <script>
+        const CHAT_STATE_KEY = 'ccv-chat-state-' + {chat_state_key};
+        const NAV_ENABLED = {'true' if nav_enabled else 'false'};
+'''
+        html_tail_rest = '''    </script>
     <div id="imgModal" class="img-modal" role="dialog" aria-modal="true" aria-label="Image viewer" onclick="if(event.target===this)closeImageModal()">
         <div class="img-modal-figure">
             <button type="button" class="img-modal-close" onclick="closeImageModal()" aria-label="Close image viewer">&times;</button>
@@ -3574,20 +4137,54 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
     </div>
 </body>
 </html>'''
-
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_template)
-
-    print(f"HTML generated successfully: {output_file}")
-    print(f"Statistics:")
-    print(f"   - Total lines processed: {total_lines}")
-    print(f"   - Real user messages: {real_user_msgs}")
-    print(f"   - Assistant messages: {assistant_msgs}")
-    print(f"   - Tool results: {tool_result_msgs}")
-    print(f"   - Summaries: {summaries}")
-    print(f"   - Rewinds: {len(rewind_dest)}")
-    print(f"   - BTW (history): {btw_count}")
-    print(f"   - HTML elements generated: {len(messages_html)}")
+        out.write(html_tail.encode('utf-8', 'replace'))
+        out.write(_CHAT_JS.encode('utf-8'))
+        out.write(html_tail_rest.encode('utf-8', 'replace'))
+        out.close()
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        # close() flushes the buffer again and fails the same way on a full
+        # disk; the temporary file must go regardless, and the error raised
+        # is the original one.
+        with contextlib.suppress(OSError):
+            try:
+                out.close()
+            finally:
+                os.remove(tmp_file)
+        raise
+
+    # Servers that serve precompressed files (nginx gzip_static) pick the .gz
+    # over the .html, so it goes through a temporary file as well, and a copy
+    # left by an earlier, larger render is removed when none is due now.
+    gz_file = output_file + '.gz'
+    if gzip_copy and messages_bytes >= GZIP_MIN_BYTES:
+        gz_tmp = gz_file + '.tmp'
+        try:
+            with open(output_file, 'rb') as src, open(gz_tmp, 'wb') as raw, \
+                    gzip.GzipFile(gz_file, 'wb', compresslevel=6, fileobj=raw) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(gz_tmp, gz_file)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(gz_tmp)
+            raise
+    else:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(gz_file)
+
+    # One write for the whole report (the manager renders chats in a loop).
+    sys.stdout.write(
+        f"HTML generated successfully: {output_file}\n"
+        f"Statistics:\n"
+        f"   - Total lines processed: {total_lines}\n"
+        f"   - Real user messages: {real_user_msgs}\n"
+        f"   - Assistant messages: {assistant_msgs}\n"
+        f"   - Tool results: {tool_result_msgs}\n"
+        f"   - Summaries: {summaries}\n"
+        f"   - Rewinds: {len(rewind_dest)}\n"
+        f"   - BTW (history): {btw_count}\n"
+        f"   - HTML elements generated: {element_count}\n"
+    )
 
 def get_chat_timestamp(messages: List[Dict]) -> str:
     """Extract the timestamp from the first message for file naming."""
@@ -3607,11 +4204,11 @@ def generate_output_filename(input_file: str, messages: List[Dict]) -> str:
 
     if timestamp:
         try:
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).astimezone()
-            date_str = dt.strftime('%Y-%m-%d')
-            time_str = dt.strftime('%H-%M')
-            return f"Chat {date_str} {time_str} {hash_short}.html"
-        except (ValueError, TypeError):
+            # Same cached parse generate_html uses for the header date, so
+            # the first message's timestamp is only parsed once per chat.
+            dt = _parse_local_datetime(timestamp)
+            return f"Chat {dt.strftime('%Y-%m-%d %H-%M')} {hash_short}.html"
+        except (ValueError, TypeError, AttributeError):
             pass
 
     return f"Chat {hash_short}.html"
@@ -3629,12 +4226,16 @@ def _wait_if_interactive():
 def main():
     """Main entry point."""
 
-    if len(sys.argv) < 2:
-        print("Usage: python visualizer.py <json_file> [output.html]")
+    # --gzip: also write a .html.gz sibling for large chats (see generate_html)
+    args = [a for a in sys.argv[1:] if a != '--gzip']
+    gzip_copy = len(args) != len(sys.argv) - 1
+
+    if len(args) < 1:
+        print("Usage: python visualizer.py <json_file> [output.html] [--gzip]")
         _wait_if_interactive()
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_file = args[0]
 
     if not Path(input_file).exists():
         print(f"Error: File {input_file} not found")
@@ -3645,8 +4246,8 @@ def main():
     messages = parse_chat_json(input_file)
     print(f"{len(messages)} lines parsed")
 
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
+    if len(args) > 1:
+        output_file = args[1]
     else:
         output_file = generate_output_filename(input_file, messages)
         print(f"Generated filename: {output_file}")
@@ -3679,7 +4280,8 @@ def main():
     except OSError:
         history_entries = []
 
-    generate_html(messages, output_file, chat_uuid=chat_uuid, history_entries=history_entries)
+    generate_html(messages, output_file, chat_uuid=chat_uuid, history_entries=history_entries,
+                  gzip_copy=gzip_copy)
 
     print(f"\nConversion completed!")
     print(f"Open file: {output_file}")
@@ -170,6 +170,14 @@ def test_centinela_contenido_desconocido_se_marca(viz):
     assert "narration" in html
 
 
+def test_centinela_tipo_desconocido_se_escapa(viz):
+    """El nombre del tipo desconocido viene del JSONL: se escapa al mostrarlo."""
+    html = viz.format_content_item({"type": "<img src=x onerror=alert(1)>"})
+    assert "unknown-type" in html
+    assert "<img" not in html
+    assert "&lt;img" in html
+
+
 # ====== Centinela: mensaje de nivel superior de tipo DESCONOCIDO ======
 
 def test_centinela_mensaje_desconocido_sin_message_se_descarta(viz):
@@ -6,6 +6,10 @@ verifican que el documento sale bien formado, que cada tipo de mensaje deja su
 marca y que el contenido del chat se escapa.
 """
 
+import copy
+
+import pytest
+
 
 def test_demo_fixture_carga_limpia(viz, demo_chat_path, capsys):
     """La fixture demo es un JSONL válido: carga sin warnings y entera."""
@@ -45,6 +49,25 @@ def test_genera_html_incluye_todos_los_tipos(viz, demo_chat_path, tmp_path):
     assert not faltan, f"Faltan marcas en el HTML generado: {faltan}"
 
 
+def test_genera_html_no_modifica_las_entradas(viz, demo_chat_path, tmp_path):
+    """generate_html no añade claves a las entradas parseadas."""
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    antes = copy.deepcopy(msgs)
+    viz.generate_html(msgs, str(tmp_path / "chat.html"))
+    assert msgs == antes
+    assert viz._TOOL_RESULT_FLAGS == {}
+    assert viz._escape_tool_result_text.cache_info().currsize == 0
+
+
+def test_genera_html_fallido_no_retiene_las_entradas(viz, demo_chat_path, tmp_path):
+    """Si generate_html falla tras el recuento (ruta de salida imposible), el
+    estado por chat del módulo queda vacío igualmente."""
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    with pytest.raises(OSError):
+        viz.generate_html(msgs, str(tmp_path / "no-existe" / "chat.html"))
+    assert viz._TOOL_RESULT_FLAGS == {}
+
+
 def test_genera_html_contenido_textual(viz, demo_chat_path, tmp_path):
     msgs = viz.parse_chat_json(str(demo_chat_path))
     out = tmp_path / "chat.html"
@@ -71,6 +94,31 @@ def test_genera_html_lista_vacia_no_rompe(viz, tmp_path):
     assert html.rstrip().endswith("</html>")
 
 
+def test_genera_html_surrogado_suelto_no_rompe(viz, tmp_path):
+    """Un surrogado suelto en el texto no tumba la página: se escribe como '?'."""
+    msgs = [{
+        "type": "user", "uuid": "x", "timestamp": "2026-06-13T09:00:00Z",
+        "message": {"role": "user", "content": "cut \ud83d"},
+    }]
+    out = tmp_path / "surrogado.html"
+    viz.generate_html(msgs, str(out))
+    assert "cut ?" in out.read_text(encoding="utf-8")
+
+
+def test_genera_html_timestamp_no_textual(viz, tmp_path):
+    """Un timestamp que no es texto deja la fecha del chat en N/A, igual que
+    generate_output_filename cae al nombre sin fecha: ninguno de los dos rompe."""
+    for ts in (12345, ["2026-06-13"]):
+        msgs = [{
+            "type": "user", "uuid": "x", "timestamp": ts,
+            "message": {"role": "user", "content": "hola"},
+        }]
+        nombre = viz.generate_output_filename("abcd1234-x.jsonl", msgs)
+        out = tmp_path / nombre
+        viz.generate_html(msgs, str(out))
+        assert "hola" in out.read_text(encoding="utf-8")
+
+
 def test_genera_html_escapa_xss(viz, tmp_path):
     msgs = [{
         "type": "user", "uuid": "x", "timestamp": "2026-06-13T09:00:00Z",
@@ -140,6 +188,8 @@ def test_separador_es_linea_css_adaptable(viz, demo_chat_path, tmp_path):
     seps = re.findall(r'<div class="separator">(.*?)</div>', html)
     assert seps, "la fixture demo debe producir al menos un separador"
     assert all(s == "" for s in seps), "los separadores deben estar vacíos"
+    # Tampoco la cabecera del resumen dibuja sus reglas con texto ━
+    assert "━" not in html
 
 
 def test_f1_imagen_inline_reemplaza_marcador(viz, tmp_path):
@@ -372,6 +422,21 @@ def test_filtro_messages_only_presente(viz, demo_chat_path, tmp_path):
     assert "isConversationMsg" in html
 
 
+def test_filtro_oculta_por_clase(viz, tmp_path):
+    """El filtro oculta con una clase CSS (.hidden-by-search) en vez de escribir
+    style.display elemento a elemento: una sola regla decide la visibilidad."""
+    out = tmp_path / "filterclass.html"
+    viz.generate_html([{"type": "user", "uuid": "u1", "timestamp": "2026-06-19T10:00:00.000Z",
+                        "message": {"role": "user", "content": "hola"}}], str(out))
+    html = out.read_text(encoding="utf-8")
+    assert ".hidden-by-search" in html
+    assert "classList.toggle('hidden-by-search'" in html
+    assert "message.style.display" not in html
+    # Las marcas solo cuentan con .filtering en el contenedor: limpiar es O(1).
+    assert ".filtering .hidden-by-search" in html
+    assert "classList.remove('filtering')" in html
+
+
 def test_ask_result_wording_nuevo_se_parsea(viz):
     """El result de AskUserQuestion con el wording nuevo ('Your questions have been
     answered:') se parsea en pares Q/A (antes caía a tool-result crudo en gris)."""
@@ -510,7 +575,8 @@ def test_navegacion_parte_del_scroll_actual(viz, tmp_path):
 
 def test_chat_persiste_estado_sessionstorage(viz, tmp_path):
     """El chat persiste estado por-apertura en sessionStorage (scroll, tema, navMode,
-    búsqueda/Messages only, bloques Edit/Write): sobrevive a F5, limpio al reabrir."""
+    búsqueda/Messages only, bloques Edit/Write, tool results abiertos): sobrevive
+    a F5, limpio al reabrir."""
     out = tmp_path / "persist.html"
     viz.generate_html([{"type": "user", "uuid": "u1", "timestamp": "2026-06-19T10:00:00.000Z",
                         "message": {"role": "user", "content": "hola"}}], str(out),
@@ -522,6 +588,7 @@ def test_chat_persiste_estado_sessionstorage(viz, tmp_path):
     assert "getEntriesByType('navigation')" in html  # F5 mantiene, reabrir limpio
     assert "restoreChatState" in html and "saveChatState" in html
     assert "editBlocksOpen" in html       # persiste los desplegables Edit/Write
+    assert "toolResultsOpen" in html      # y los tool results expandidos
     assert 'id="chatLoading"' in html      # overlay de carga (anti doble-salto)
 
 
@@ -590,3 +657,131 @@ def test_chat_agente_marca_en_header(viz, tmp_path):
     html = out.read_text(encoding="utf-8")
     assert "agent-chip" in html and "AGENT CHAT" in html
     assert "11111111-1111-1111-1111-111111111111" in html
+
+
+def test_gzip_copy_solo_en_chats_grandes(viz, demo_chat_path, tmp_path, monkeypatch):
+    """gzip_copy escribe además `<salida>.gz` (mismo documento, comprimido) cuando
+    los mensajes alcanzan GZIP_MIN_BYTES; el .html plano se escribe siempre."""
+    import gzip
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    out = tmp_path / "chat.html"
+    viz.generate_html(msgs, str(out), gzip_copy=True)
+    assert out.exists()
+    assert not (tmp_path / "chat.html.gz").exists()  # chat pequeño: sin copia
+
+    monkeypatch.setattr(viz, "GZIP_MIN_BYTES", 1)
+    viz.generate_html(msgs, str(out), gzip_copy=True)
+    gz = tmp_path / "chat.html.gz"
+    assert gz.exists()
+    with gzip.open(gz, "rt", encoding="utf-8") as f:
+        assert f.read() == out.read_text(encoding="utf-8")
+    assert not (tmp_path / "chat.html.gz.tmp").exists()
+
+    # Un render posterior sin copia no deja el .gz anterior (ya obsoleto).
+    monkeypatch.setattr(viz, "GZIP_MIN_BYTES", 10**12)
+    viz.generate_html(msgs, str(out), gzip_copy=True)
+    assert not gz.exists()
+
+
+def test_gzip_copy_fallida_no_deja_gz(viz, demo_chat_path, tmp_path, monkeypatch):
+    """Si la compresión falla a mitad, no queda un .gz truncado ni el temporal."""
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    out = tmp_path / "chat.html"
+    monkeypatch.setattr(viz, "GZIP_MIN_BYTES", 1)
+
+    def _boom(*a, **k):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(viz.shutil, "copyfileobj", _boom)
+    with pytest.raises(OSError):
+        viz.generate_html(msgs, str(out), gzip_copy=True)
+    assert out.exists()
+    assert not (tmp_path / "chat.html.gz").exists()
+    assert not (tmp_path / "chat.html.gz.tmp").exists()
+
+
+def test_navegacion_omitida_en_chat_minimo(viz, demo_chat_path, tmp_path):
+    """Con un solo mensaje de conversación no hay nada que navegar: los
+    controles prev/next no se emiten y el script lo sabe (NAV_ENABLED)."""
+    out = tmp_path / "mini.html"
+    viz.generate_html([{"type": "user", "uuid": "u1", "timestamp": "2026-06-19T10:00:00.000Z",
+                        "message": {"role": "user", "content": "hola"}}], str(out))
+    html = out.read_text(encoding="utf-8")
+    assert 'id="prevMsg"' not in html
+    assert "const NAV_ENABLED = false;" in html
+
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    viz.generate_html(msgs, str(out))
+    html = out.read_text(encoding="utf-8")
+    assert 'id="prevMsg"' in html and 'id="navCounter"' in html
+    assert "const NAV_ENABLED = true;" in html
+
+
+def test_render_fallido_no_deja_html_truncado(viz, demo_chat_path, tmp_path, monkeypatch):
+    """La salida se escribe en streaming a un temporal: si el render falla a
+    mitad, el .html previo sigue intacto y no queda el .tmp."""
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    out = tmp_path / "chat.html"
+    viz.generate_html(msgs, str(out))
+    previo = out.read_text(encoding="utf-8")
+
+    def _boom(*a, **k):
+        raise RuntimeError("fallo de render")
+    monkeypatch.setattr(viz, "format_message_html", _boom)
+    with pytest.raises(RuntimeError):
+        viz.generate_html(msgs, str(out))
+    assert out.read_text(encoding="utf-8") == previo
+    assert not (tmp_path / "chat.html.tmp").exists()
+
+
+def test_disco_lleno_no_deja_tmp(viz, demo_chat_path, tmp_path, monkeypatch):
+    """Si la escritura falla (disco lleno), el close del limpiado vuelve a
+    fallar al vaciar el buffer: aun así se borra el .tmp y sale el error original."""
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    out = tmp_path / "chat.html"
+    abrir = open
+
+    class _DiscoLleno:
+        def __init__(self, *a, **k):
+            self._f = abrir(*a, **k)
+
+        def write(self, data):
+            raise OSError(28, "No space left on device")
+
+        def close(self):
+            self._f.close()
+            raise OSError(28, "No space left on device (flush)")
+
+    monkeypatch.setattr(viz, "open", _DiscoLleno, raising=False)
+    with pytest.raises(OSError, match="No space left on device$"):
+        viz.generate_html(msgs, str(out))
+    assert not (tmp_path / "chat.html.tmp").exists()
+    assert not out.exists()
+
+
+def test_render_paralelo_igual_que_serie(viz, demo_chat_path, tmp_path, monkeypatch):
+    """Por encima de PARALLEL_RENDER_MIN los mensajes se renderizan en un pool
+    de procesos: el documento debe salir idéntico al render en serie."""
+    msgs = viz.parse_chat_json(str(demo_chat_path))
+    serie = tmp_path / "serie.html"
+    viz.generate_html(msgs, str(serie), time_format="24h")
+
+    monkeypatch.setattr(viz, "PARALLEL_RENDER_MIN", 1)
+    monkeypatch.setattr(viz, "_RENDER_CHUNK", 4)
+    monkeypatch.setattr(viz.os, "cpu_count", lambda: 2)
+    paralelo = tmp_path / "paralelo.html"
+    try:
+        viz.generate_html(msgs, str(paralelo), time_format="24h")
+        # El pool se reutiliza: un segundo chat con otro formato no hereda el estado.
+        paralelo12 = tmp_path / "paralelo12.html"
+        viz.generate_html(msgs, str(paralelo12), time_format="12h")
+    finally:
+        viz.shutdown_render_pool()
+    serie12 = tmp_path / "serie12.html"
+    monkeypatch.setattr(viz, "PARALLEL_RENDER_MIN", 10**9)
+    viz.generate_html(msgs, str(serie12), time_format="12h")
+
+    def sin_fecha(p):
+        return [l for l in p.read_text(encoding="utf-8").splitlines() if not l.startswith("Generated:")]
+    assert sin_fecha(paralelo) == sin_fecha(serie)
+    assert sin_fecha(paralelo12) == sin_fecha(serie12)
+    assert sin_fecha(paralelo12) != sin_fecha(paralelo)
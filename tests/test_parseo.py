@@ -25,19 +25,29 @@ def test_parse_chat_json_basico(viz, write_jsonl):
     assert msgs[1]["message"]["content"] == "qué tal"
 
 
-def test_parse_chat_json_numera_lineas(viz, write_jsonl):
+def test_parse_chat_json_no_anade_claves(viz, write_jsonl):
+    """Las entradas salen tal cual del JSONL, sin campos añadidos por línea."""
     path = write_jsonl([{"a": 1}, {"a": 2}, {"a": 3}])
     msgs = viz.parse_chat_json(str(path))
-    assert [m["_line_number"] for m in msgs] == [1, 2, 3]
+    assert msgs == [{"a": 1}, {"a": 2}, {"a": 3}]
 
 
-def test_parse_chat_json_ignora_lineas_vacias(viz, tmp_path):
+def test_parse_chat_json_salta_lineas_que_no_son_objeto(viz, tmp_path, capsys):
+    path = tmp_path / "no_objeto.jsonl"
+    path.write_text('{"a": 1}\n[1, 2]\n7\n{"a": 2}\n', encoding="utf-8")
+    msgs = viz.parse_chat_json(str(path))
+    assert msgs == [{"a": 1}, {"a": 2}]
+    salida = capsys.readouterr().out.lower()
+    assert "line 2" in salida and "line 3" in salida
+
+
+def test_parse_chat_json_ignora_lineas_vacias(viz, tmp_path, capsys):
     path = tmp_path / "con_vacias.jsonl"
-    path.write_text('{"a": 1}\n\n   \n{"a": 2}\n', encoding="utf-8")
+    path.write_text('{"a": 1}\n\n   \n{"a": 2}\n{ rota\n', encoding="utf-8")
     msgs = viz.parse_chat_json(str(path))
     assert len(msgs) == 2
-    # La numeración corresponde a la línea física del archivo.
-    assert msgs[1]["_line_number"] == 4
+    # La numeración de los avisos corresponde a la línea física del archivo.
+    assert "line 5" in capsys.readouterr().out.lower()
 
 
 def test_parse_chat_json_linea_malformada_no_rompe(viz, tmp_path, capsys):
@@ -49,6 +59,32 @@ def test_parse_chat_json_linea_malformada_no_rompe(viz, tmp_path, capsys):
     assert "line 2" in capsys.readouterr().out.lower()
 
 
+def test_parse_chat_json_surrogado_suelto(viz, tmp_path, capsys, monkeypatch):
+    """Un surrogado suelto (salida cortada a mitad de emoji) se carga igual con
+    o sin orjson: si el parser estricto rechaza la línea, json.loads la reintenta."""
+    path = tmp_path / "surrogado.jsonl"
+    path.write_bytes(b'{"t": "cut \\ud83d"}\n{"t": "ok"}\n')
+
+    def _estricto(line):
+        if b"\\ud83d" in line:
+            raise ValueError("no matched low surrogate")
+        return viz.json.loads(line)
+    for parser in (None, _estricto):
+        monkeypatch.setattr(viz, "_orjson_loads", parser)
+        msgs = viz.parse_chat_json(str(path))
+        assert [m["t"] for m in msgs] == ["cut \ud83d", "ok"]
+    assert "Warning" not in capsys.readouterr().out
+
+
+def test_parse_chat_json_crlf_y_bom(viz, tmp_path, capsys):
+    """Saltos de línea Windows y BOM inicial no rompen el parseo ni la numeración."""
+    path = tmp_path / "crlf.jsonl"
+    path.write_bytes('\ufeff{"a": 1}\r\n{"a": "ñ"}\r\n{ rota\r\n'.encode("utf-8"))
+    msgs = viz.parse_chat_json(str(path))
+    assert [m["a"] for m in msgs] == [1, "ñ"]
+    assert "line 3" in capsys.readouterr().out.lower()
+
+
 def test_parse_chat_json_preserva_unicode(viz, write_jsonl):
     path = write_jsonl([{"message": {"role": "user", "content": "ñandú € 日本語"}}])
     msgs = viz.parse_chat_json(str(path))
@@ -82,6 +118,14 @@ def test_format_timestamp_24h_sin_meridiano(viz, monkeypatch):
     assert not out.endswith("AM") and not out.endswith("PM")
 
 
+def test_generate_output_filename_timestamp_invalido_cae_al_hash(viz):
+    for ts in ("no-es-fecha", 12345):
+        msgs = [{"type": "user", "timestamp": ts}]
+        assert viz.generate_output_filename("abcd1234-x.jsonl", msgs) == "Chat abcd1234.html"
+    ok = viz.generate_output_filename("abcd1234-x.jsonl", [{"timestamp": "2026-06-13T15:30:00Z"}])
+    assert ok.startswith("Chat 2026-06-1") and ok.endswith(" abcd1234.html")
+
+
 # ====== escape_html_preserve_structure ======
 
 def test_escape_html_neutraliza_etiquetas(viz):
@@ -107,6 +151,12 @@ def test_escape_html_espacios_multiples_a_nbsp(viz):
     assert "&nbsp;" in out
 
 
+def test_escape_html_rachas_impares_de_espacios(viz):
+    """Cada espacio de una racha de 2+ pasa a &nbsp;; los sueltos se mantienen."""
+    out = viz.escape_html_preserve_structure("a   b c")
+    assert out == "a&nbsp;&nbsp;&nbsp;b c"
+
+
 def test_escape_html_recorta_br_extremos(viz):
     out = viz.escape_html_preserve_structure("\n\nhola\n\n")
     assert out == "hola"
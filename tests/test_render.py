@@ -35,6 +35,16 @@ def test_render_command_message_uuid_vacio(viz):
     assert "N/A" in html
 
 
+def test_ids_cortos_se_escapan_solo_si_hace_falta(viz):
+    """Los ids reales (uuid, toolu_…) salen tal cual; uno raro se escapa,
+    también el Leaf UUID del resumen, que antes se emitía sin escapar."""
+    html = viz.render_command_message("/x", "", "", "11111111-2222-3333-4444-555566667777", "")
+    assert "ID: 555566667777" in html
+    html = viz.format_message_html({"type": "summary", "summary": "s", "leafUuid": '"><b>x</b>'}, 0)
+    assert "<b>" not in html
+    assert "&lt;b&gt;" in html
+
+
 # ====== render_stdout_message ======
 
 def test_render_stdout_message_marca(viz):
@@ -136,6 +146,15 @@ def test_render_compact_block_navegable(viz):
     assert "compact-msg" in html
 
 
+def test_render_compact_block_sin_onclick_inline(viz):
+    """El plegado lo gestiona un listener delegado de la página: el bloque no
+    lleva onclick propio ni ids derivados del uuid."""
+    html = viz.render_compact_block({"summary_text": "r", "uuid": "abc-123-uuid"})
+    assert "onclick" not in html
+    assert 'class="compact-toggle"' in html
+    assert 'id="compact-' not in html
+
+
 # ====== render_user_rejection_block ======
 
 def test_render_user_rejection_con_feedback(viz):